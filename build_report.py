@@ -0,0 +1,168 @@
+"""
+Securaa Documentation Build Report
+Machine-readable per-run report shared by the HTML and PDF generators, with
+regression checks against the previous run.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Configuration
+REPORT_DIR = Path('.doc-cache') / 'reports'
+
+
+class BuildReport:
+    """
+    Collects per-document sizes, counts, stage timings and cache hits for one run.
+    """
+
+    def __init__(self, generator: str):
+        self.generator = generator
+        self.started = datetime.now(timezone.utc)
+        self._start_time = time.perf_counter()
+        self.documents = {}
+        self.total_seconds = None
+
+    def document(self, name: str) -> dict:
+        """Return the report entry for a document, creating it on first use."""
+        if name not in self.documents:
+            self.documents[name] = {
+                'input_bytes': 0,
+                'output_bytes': 0,
+                'diagrams': 0,
+                'code_blocks': 0,
+                'stages': {},
+                'cache_hits': 0,
+                'cache_misses': 0,
+            }
+        return self.documents[name]
+
+    def finish(self):
+        """Stop the clock, unless total_seconds was set explicitly (e.g. for merged shards)."""
+        if self.total_seconds is None:
+            self.total_seconds = round(time.perf_counter() - self._start_time, 4)
+
+    def to_dict(self) -> dict:
+        documents = self.documents
+        return {
+            'generator': self.generator,
+            'started': self.started.isoformat(timespec='seconds'),
+            'total_seconds': self.total_seconds,
+            'totals': {
+                'documents': len(documents),
+                'input_bytes': sum(doc['input_bytes'] for doc in documents.values()),
+                'output_bytes': sum(doc['output_bytes'] for doc in documents.values()),
+                'diagrams': sum(doc['diagrams'] for doc in documents.values()),
+                'code_blocks': sum(doc['code_blocks'] for doc in documents.values()),
+                'cache_hits': sum(doc['cache_hits'] for doc in documents.values()),
+                'cache_misses': sum(doc['cache_misses'] for doc in documents.values()),
+            },
+            'documents': {name: documents[name] for name in sorted(documents)},
+        }
+
+    def write(self, path: Path):
+        """Write the report atomically, so a killed run never leaves half a file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write('\n')
+        os.replace(tmp_path, path)
+
+
+@contextmanager
+def stage_timer(entry: dict, stage: str):
+    """Add the duration of the enclosed block to entry['stages'][stage] in seconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages = entry['stages']
+        stages[stage] = round(stages.get(stage, 0) + time.perf_counter() - start, 4)
+
+
+def count_blocks(html: str) -> tuple:
+    """Count Mermaid diagrams and code blocks in a generated page."""
+    return html.count('<div class="mermaid"'), html.count('<pre')
+
+
+def load_report(path: Path):
+    """Load a previous report, or None if there is none."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def compare_reports(previous: dict, current: dict, max_size_growth: float = None,
+                    max_time_regression: float = None) -> list:
+    """
+    Compare a report against the previous one.
+
+    Thresholds are percentages; None disables a check. Returns a list of
+    human-readable violations.
+    """
+    violations = []
+
+    if max_size_growth is not None:
+        for name, doc in current['documents'].items():
+            old = previous['documents'].get(name)
+            if not old or not old['output_bytes']:
+                continue
+            growth = (doc['output_bytes'] - old['output_bytes']) * 100 / old['output_bytes']
+            if growth > max_size_growth:
+                violations.append(
+                    f"{name} grew {growth:.1f}% ({old['output_bytes']} -> {doc['output_bytes']} bytes, "
+                    f"limit {max_size_growth:g}%)"
+                )
+
+    if max_time_regression is not None and previous.get('total_seconds'):
+        regression = (current['total_seconds'] - previous['total_seconds']) * 100 / previous['total_seconds']
+        if regression > max_time_regression:
+            violations.append(
+                f"total build time regressed {regression:.1f}% ({previous['total_seconds']:.2f}s -> "
+                f"{current['total_seconds']:.2f}s, limit {max_time_regression:g}%)"
+            )
+
+    return violations
+
+
+def add_report_arguments(parser, default_report: Path):
+    """Add the report and regression-gate options to a generator's argument parser."""
+    parser.add_argument('--report', type=Path, default=default_report,
+                        help=f'where to write the JSON build report (default: {default_report})')
+    parser.add_argument('--baseline', type=Path, default=None,
+                        help='report to compare against (default: the previous report at --report)')
+    parser.add_argument('--max-size-growth', type=float, default=None, metavar='PERCENT',
+                        help='fail if any output grows more than PERCENT over the baseline')
+    parser.add_argument('--max-time-regression', type=float, default=None, metavar='PERCENT',
+                        help='fail if total build time regresses more than PERCENT over the baseline')
+
+
+def finish_report(report: BuildReport, args) -> int:
+    """
+    Write the report, compare it with the baseline and print the outcome.
+
+    Returns 1 if a regression threshold was exceeded, else 0.
+    """
+    report.finish()
+    baseline = load_report(args.baseline or args.report)
+    report.write(args.report)
+    print(f"  Build report: {args.report}")
+
+    if baseline is None or baseline.get('generator') != report.generator:
+        return 0
+
+    violations = compare_reports(baseline, report.to_dict(), args.max_size_growth,
+                                 args.max_time_regression)
+    if violations:
+        print(f"\n=== Regressions: {len(violations)} ===")
+        for violation in violations:
+            print(f"  {violation}")
+        return 1
+    return 0
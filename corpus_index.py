@@ -0,0 +1,351 @@
+"""
+Securaa Corpus Index
+SQLite index of the documentation corpus, filled by the HTML generator as it
+converts each document: documents, heading sections, Mermaid diagrams (type,
+node and edge counts) and code blocks (language), with an FTS5 full-text index
+over all of them. Only documents whose markdown changed are re-indexed.
+
+    python3 corpus_index.py search mongodb --kind diagram --type sequence
+    python3 corpus_index.py search '"kafka consumer"' --kind section
+    python3 corpus_index.py stats
+    python3 corpus_index.py sql "SELECT type, COUNT(*) FROM diagrams GROUP BY type"
+"""
+
+import argparse
+import hashlib
+import html
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# Configuration
+INDEX_PATH = Path('.doc-cache') / 'corpus.db'
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    source TEXT,
+    title TEXT,
+    digest TEXT,
+    input_bytes INTEGER,
+    sections INTEGER,
+    diagrams INTEGER,
+    code_blocks INTEGER
+);
+CREATE TABLE IF NOT EXISTS sections (
+    document TEXT,
+    anchor TEXT,
+    level INTEGER,
+    title TEXT,
+    position INTEGER,
+    text_bytes INTEGER,
+    PRIMARY KEY (document, anchor)
+);
+CREATE TABLE IF NOT EXISTS diagrams (
+    document TEXT,
+    line INTEGER,
+    section TEXT,
+    type TEXT,
+    nodes INTEGER,
+    edges INTEGER,
+    valid INTEGER,
+    source TEXT,
+    PRIMARY KEY (document, line)
+);
+CREATE TABLE IF NOT EXISTS code_blocks (
+    document TEXT,
+    line INTEGER,
+    language TEXT,
+    lines INTEGER,
+    source TEXT,
+    PRIMARY KEY (document, line)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(
+    title, text, kind UNINDEXED, document UNINDEXED, ref UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+"""
+
+HEADING_PATTERN = re.compile(r'<h[1-6][^>]*\sid="([^"]*)"[^>]*>')
+DIAGRAM_LINE_PATTERN = re.compile(r'<div class="mermaid" data-line="(\d+)">')
+MERMAID_BLOCK_PATTERN = re.compile(r'<div class="mermaid"[^>]*>.*?</div>|<pre class="mermaid-invalid">.*?</pre>',
+                                   re.S)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+SPACE_PATTERN = re.compile(r'\s+')
+LANGUAGE_PATTERN = re.compile(r'[\w#+-][\w#.+-]*')
+
+SEARCH_KINDS = ('section', 'diagram', 'code')
+
+
+def index_fingerprint(converter: str) -> str:
+    """Hash the converter fingerprint with this module, so a change to either rebuilds the index."""
+    digest = hashlib.sha256(Path(__file__).read_bytes())
+    digest.update(f'{SCHEMA_VERSION} {converter}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def plain_text(fragment: str) -> str:
+    """Strip the tags from an HTML fragment and collapse its whitespace."""
+    return SPACE_PATTERN.sub(' ', html.unescape(TAG_PATTERN.sub(' ', fragment))).strip()
+
+
+def toc_sections(toc_tokens: list):
+    """Yield (level, id, title) for every heading in Markdown's nested toc_tokens, in document order."""
+    for token in toc_tokens:
+        yield token['level'], token['id'], html.unescape(token['name'])
+        yield from toc_sections(token['children'])
+
+
+def section_texts(body: str) -> tuple:
+    """
+    Split a page body at its headings.
+
+    Returns ({heading id: section text}, {diagram line: heading id}); section
+    text runs to the next heading of any level and leaves out diagram sources.
+    """
+    texts = {}
+    diagram_sections = {}
+    headings = list(HEADING_PATTERN.finditer(body))
+    for number, heading in enumerate(headings):
+        end = headings[number + 1].start() if number + 1 < len(headings) else len(body)
+        fragment = body[heading.end():end]
+        for line in DIAGRAM_LINE_PATTERN.findall(fragment):
+            diagram_sections[int(line)] = heading.group(1)
+        texts[heading.group(1)] = plain_text(MERMAID_BLOCK_PATTERN.sub(' ', fragment))
+    return texts, diagram_sections
+
+
+def fence_language(match) -> str:
+    """Language named on a fence opener (```go, ```.go, ```{.go}), or None."""
+    language = LANGUAGE_PATTERN.search(match.group(2))
+    return language.group(0).lower() if language else None
+
+
+def document_blocks(md_content: str) -> tuple:
+    """
+    Find the top-level fenced blocks of a markdown document.
+
+    Returns ({first line: mermaid source}, [(first line, language, source)])
+    with 1-based line numbers, using the same fence rules as the Mermaid
+    extension; a diagram's line is that of its first non-blank source line,
+    as in the parse's diagrams.
+    """
+    # Imported here: mermaid_extension pulls in Markdown, which no-op builds never load
+    from mermaid_extension import fenced_blocks, is_mermaid_fence, mermaid_source
+    lines = md_content.split('\n')
+    diagram_sources = {}
+    code_blocks = []
+    for start, end, match in fenced_blocks(lines):
+        if is_mermaid_fence(lines[start], match):
+            source, line = mermaid_source(lines, start, end)
+            diagram_sources[line] = source
+        else:
+            code_blocks.append((start + 2, fence_language(match), '\n'.join(lines[start + 1:end])))
+    return diagram_sources, code_blocks
+
+
+class CorpusIndex:
+    """
+    The corpus database, opened read-write for a build.
+
+    fingerprint identifies the converter that produced the indexed parses,
+    either as a string or as a function returning one, which is called on
+    the first update, so builds that convert nothing never compute it. When
+    a different converter made the index, the index is emptied then and
+    every document is re-indexed; documents the build already reused before
+    that are missing until the next build, which converts them again.
+    """
+
+    def __init__(self, path: Path = INDEX_PATH, fingerprint=''):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+        self.converter = fingerprint
+        self.fingerprint = None
+        self.digests = dict(self.connection.execute('SELECT name, digest FROM documents'))
+
+    def is_current(self, name: str, digest: str) -> bool:
+        """Whether the document is indexed from markdown with this digest."""
+        return self.digests.get(name) == digest
+
+    def check_fingerprint(self):
+        """Empty the index if a different converter made it."""
+        if self.fingerprint is not None:
+            return
+        converter = self.converter() if callable(self.converter) else self.converter
+        self.fingerprint = index_fingerprint(converter)
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if not row or row[0] != self.fingerprint:
+            with self.connection:
+                for table in ('documents', 'sections', 'diagrams', 'code_blocks', 'search'):
+                    self.connection.execute(f'DELETE FROM {table}')
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)",
+                                        (self.fingerprint,))
+            self.digests = {}
+
+    def update(self, name: str, source: str, title: str, digest: str, md_content: str, parsed: dict):
+        """Replace a document's rows with those of its current markdown and parse, unless already current."""
+        self.check_fingerprint()
+        if self.is_current(name, digest):
+            return
+        texts, diagram_sections = section_texts(parsed['body'])
+        sections = list(toc_sections(parsed['toc_tokens']))
+        diagram_sources, code_blocks = document_blocks(md_content)
+
+        with self.connection:
+            self._delete(name)
+            for position, (level, anchor, heading) in enumerate(sections):
+                text = texts.get(anchor, '')
+                self.connection.execute('INSERT OR REPLACE INTO sections VALUES (?, ?, ?, ?, ?, ?)',
+                                        (name, anchor, level, heading, position, len(text.encode('utf-8'))))
+                self.connection.execute('INSERT INTO search VALUES (?, ?, ?, ?, ?)',
+                                        (heading, text, 'section', name, anchor))
+            for diagram in parsed['diagrams']:
+                diagram_source = diagram_sources.get(diagram['line'])
+                if diagram_source is None:
+                    print(f"  Warning: {name}: no mermaid fence at line {diagram['line']}, diagram not indexed")
+                    continue
+                section = diagram_sections.get(diagram['line'])
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO diagrams VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (name, diagram['line'], section, diagram.get('type'), diagram.get('nodes'),
+                     diagram.get('edges'), int(not diagram['errors']), diagram_source))
+                self.connection.execute('INSERT INTO search VALUES (?, ?, ?, ?, ?)',
+                                        (diagram.get('type') or 'mermaid', diagram_source, 'diagram', name,
+                                         str(diagram['line'])))
+            for line, language, code in code_blocks:
+                self.connection.execute('INSERT OR REPLACE INTO code_blocks VALUES (?, ?, ?, ?, ?)',
+                                        (name, line, language, code.count('\n') + 1, code))
+                self.connection.execute('INSERT INTO search VALUES (?, ?, ?, ?, ?)',
+                                        (language or '', code, 'code', name, str(line)))
+            self.connection.execute('INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                    (name, source, title, digest, len(md_content.encode('utf-8')), len(sections),
+                                     len(parsed['diagrams']), len(code_blocks)))
+        self.digests[name] = digest
+
+    def prune(self, names: set):
+        """Remove documents that are no longer part of the corpus."""
+        stale = {name for name, in self.connection.execute('SELECT name FROM documents')} - set(names)
+        with self.connection:
+            for name in stale:
+                self._delete(name)
+        for name in stale:
+            self.digests.pop(name, None)
+
+    def _delete(self, name: str):
+        for table in ('sections', 'diagrams', 'code_blocks', 'search'):
+            self.connection.execute(f'DELETE FROM {table} WHERE document = ?', (name,))
+        self.connection.execute('DELETE FROM documents WHERE name = ?', (name,))
+
+    def close(self):
+        self.connection.close()
+
+
+def open_readonly(path: Path = INDEX_PATH) -> sqlite3.Connection:
+    """Open an existing index for queries."""
+    return sqlite3.connect(f'file:{Path(path).as_posix()}?mode=ro', uri=True)
+
+
+def search(connection: sqlite3.Connection, query: str, kind: str = None, diagram_type: str = None,
+           language: str = None, limit: int = 20) -> list:
+    """
+    Full-text search over sections, diagrams and code blocks.
+
+    query uses FTS5 syntax (words, "phrases", OR, prefix*). diagram_type
+    matches the start of the Mermaid type ('sequence' finds sequenceDiagram)
+    and language the code block language; either implies its kind.
+    Returns (kind, document, ref, title, snippet) rows, best matches first;
+    ref is the heading id of a section or the markdown line of a block.
+    """
+    sql = ["SELECT kind, document, ref, title, snippet(search, 1, '[', ']', '...', 12) FROM search "
+           "WHERE search MATCH ?"]
+    params = [query]
+    if diagram_type:
+        kind = 'diagram'
+        sql.append("AND EXISTS (SELECT 1 FROM diagrams d WHERE d.document = search.document "
+                   "AND d.line = CAST(search.ref AS INTEGER) AND d.type LIKE ? || '%')")
+        params.append(diagram_type)
+    if language:
+        kind = 'code'
+        sql.append("AND EXISTS (SELECT 1 FROM code_blocks c WHERE c.document = search.document "
+                   "AND c.line = CAST(search.ref AS INTEGER) AND c.language = ?)")
+        params.append(language.lower())
+    if kind:
+        sql.append('AND kind = ?')
+        params.append(kind)
+    sql.append('ORDER BY rank LIMIT ?')
+    params.append(limit)
+    return connection.execute(' '.join(sql), params).fetchall()
+
+
+def print_rows(cursor):
+    """Print a query result as tab-separated lines under its column names."""
+    print('\t'.join(column[0] for column in cursor.description))
+    for row in cursor:
+        print('\t'.join('' if value is None else str(value) for value in row))
+
+
+def print_stats(connection: sqlite3.Connection):
+    """Print per-document sizes and counts, and the corpus-wide diagram and code mix."""
+    print_rows(connection.execute(
+        'SELECT name, input_bytes, sections, diagrams, code_blocks FROM documents ORDER BY input_bytes DESC'))
+    print()
+    print_rows(connection.execute(
+        'SELECT type, COUNT(*) AS diagrams, SUM(nodes) AS nodes, SUM(edges) AS edges, MAX(nodes) AS largest '
+        'FROM diagrams GROUP BY type ORDER BY diagrams DESC'))
+    print()
+    print_rows(connection.execute(
+        'SELECT language, COUNT(*) AS blocks, SUM(lines) AS lines FROM code_blocks '
+        'GROUP BY language ORDER BY blocks DESC'))
+
+
+def main(argv=None) -> int:
+    """Query the corpus index."""
+    parser = argparse.ArgumentParser(description='Query the Securaa documentation corpus index.')
+    parser.add_argument('--index', type=Path, default=INDEX_PATH,
+                        help=f'index written by generate_documentation.py (default: {INDEX_PATH})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    search_parser = commands.add_parser('search', help='full-text search (FTS5 query syntax)')
+    search_parser.add_argument('query')
+    search_parser.add_argument('--kind', choices=SEARCH_KINDS, help='only sections, diagrams or code blocks')
+    search_parser.add_argument('--type', dest='diagram_type',
+                               help='only diagrams of this Mermaid type (prefix, e.g. sequence)')
+    search_parser.add_argument('--language', help='only code blocks in this language')
+    search_parser.add_argument('--limit', type=int, default=20)
+    commands.add_parser('stats', help='per-document sizes and corpus-wide diagram and code counts')
+    sql_parser = commands.add_parser('sql', help='run a read-only SQL query')
+    sql_parser.add_argument('statement')
+    args = parser.parse_args(argv)
+
+    if not args.index.exists():
+        print(f"Error: no index at {args.index}; run generate_documentation.py first")
+        return 2
+    connection = open_readonly(args.index)
+    start = time.perf_counter()
+    try:
+        if args.command == 'search':
+            rows = search(connection, args.query, args.kind, args.diagram_type, args.language, args.limit)
+            for kind, document, ref, title, snippet in rows:
+                location = f'{document}#{ref}' if kind == 'section' else f'{document} (line {ref})'
+                print(f"{kind:8} {location}  {title}\n         {' '.join(snippet.split())}")
+            print(f"\n{len(rows)} results", end='')
+        elif args.command == 'stats':
+            print_stats(connection)
+        else:
+            print_rows(connection.execute(args.statement))
+    except sqlite3.Error as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        connection.close()
+    print(f"  ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
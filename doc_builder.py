@@ -0,0 +1,171 @@
+"""
+Securaa Documentation Builder
+Library API over the HTML and PDF generators for long-running callers such as
+the documentation portal. Configuration is passed to the Builder instead of
+read from the scripts' module constants, Markdown and Playwright are imported
+on first use, and the Markdown converter and browser stay warm between calls.
+
+    builder = Builder(docs_dir=Path('/srv/docs'))
+    page = builder.build_html(md_content, 'Release Notes')
+    report = builder.build(incremental=True)
+    pdf = await builder.render_pdf(Path('/srv/docs/print/release-notes.html'))
+    await builder.close()
+"""
+
+import asyncio
+import functools
+from pathlib import Path
+
+from build_report import BuildReport
+from generate_documentation import (DEFAULT_HIGHLIGHT, DEFAULT_VARIANTS, DOCS_DIR, MD_FILES, OUTPUT_VARIANTS, ROOT_DIR,
+                                    build_documents, build_fingerprint, converter_fingerprint, create_markdown,
+                                    load_build_state, parse_markdown, render_page, save_build_state)
+
+# Configuration
+CACHE_DIR = Path('.doc-cache')
+
+
+class Builder:
+    """
+    Builds documentation pages and PDFs with configuration held on the instance.
+
+    documents is a list of (markdown path relative to source_dir, title), like
+    MD_FILES, and variants names the OUTPUT_VARIANTS written next to each page.
+    Nothing heavy is imported until the first conversion or render.
+    """
+
+    def __init__(self, docs_dir: Path = DOCS_DIR, source_dir: Path = ROOT_DIR, documents: list = None,
+                 variants: list = DEFAULT_VARIANTS, split_threshold: int = None, cache_dir: Path = CACHE_DIR,
+                 max_pages: int = None, highlight: str = DEFAULT_HIGHLIGHT, stream_pdf: bool = False,
+                 pdf_backend: str = 'chromium'):
+        self.docs_dir = Path(docs_dir)
+        self.source_dir = Path(source_dir)
+        self.documents = list(documents) if documents is not None else list(MD_FILES)
+        self.variants = list(variants)
+        self.split_threshold = split_threshold
+        self.cache_dir = Path(cache_dir)
+        self.max_pages = max_pages
+        self.highlight = highlight
+        self.stream_pdf = stream_pdf
+        self.pdf_backend = pdf_backend
+        self.anchor_index = {}
+        self.page_links = {}
+        self._markdown = None
+        self._pool = None
+        self._backends = None
+        self._monitor = None
+
+    def parse(self, md_content: str) -> dict:
+        """Parse markdown into {'body', 'toc_tokens', 'diagrams'} with the warm Markdown converter."""
+        if self._markdown is None:
+            self._markdown = create_markdown(self.highlight)
+        return parse_markdown(md_content, self._markdown)
+
+    def convert(self, md_content: str, diagrams: list = None) -> str:
+        """Convert markdown to a page body with the warm Markdown converter."""
+        parsed = self.parse(md_content)
+        if diagrams is not None:
+            diagrams.extend(parsed['diagrams'])
+        return parsed['body']
+
+    def build_html(self, md_content: str, title: str, diagrams: list = None) -> bytes:
+        """
+        Convert one markdown document to a complete page without touching disk.
+        Validation results for each Mermaid block are appended to diagrams if given.
+        """
+        return render_page(title, self.convert(md_content, diagrams)).encode('utf-8')
+
+    def build_variants(self, md_content: str, title: str, variants: list = None) -> dict:
+        """
+        Render one markdown document as the screen page and each named variant
+        (default: this builder's variants) from a single parse, without touching disk.
+        Returns {variant name: page bytes}, with the screen page under 'web'.
+        """
+        parsed = self.parse(md_content)
+        pages = {'web': render_page(title, parsed['body']).encode('utf-8')}
+        for name in (self.variants if variants is None else variants):
+            pages[name] = OUTPUT_VARIANTS[name].render(title, parsed).encode('utf-8')
+        return pages
+
+    def build(self, incremental: bool = True, selected: set = None) -> BuildReport:
+        """
+        Write every configured document (or the selected output pages) to docs_dir.
+
+        Incremental builds skip documents whose markdown is unchanged since the
+        last incremental build into the same cache_dir, and reuse cached parses
+        of the rest where possible. Link data for the built pages is kept in
+        anchor_index and page_links, and the corpus index in cache_dir/corpus.db
+        (see corpus_index.py) is brought up to date.
+        """
+        from corpus_index import CorpusIndex
+
+        report = BuildReport('html')
+        state = None
+        parse_cache = None
+        state_path = self.cache_dir / 'html-build-state.json'
+        if incremental:
+            parse_cache = self.cache_dir / 'parsed'
+            state = load_build_state(state_path, build_fingerprint({
+                'variants': self.variants,
+                'highlight': self.highlight,
+                'split_threshold': self.split_threshold,
+                'source_dir': str(self.source_dir),
+                'docs_dir': str(self.docs_dir),
+            }))
+        index = CorpusIndex(self.cache_dir / 'corpus.db', functools.partial(converter_fingerprint, self.highlight))
+        try:
+            build_documents(report, self.anchor_index, self.page_links, self.variants, selected,
+                            self.split_threshold, state, docs_dir=self.docs_dir, root_dir=self.source_dir,
+                            documents=self.documents, parse=self.parse, parse_cache=parse_cache,
+                            highlight=self.highlight, index=index)
+            if selected is None:
+                index.prune(report.documents)
+        finally:
+            index.close()
+        if state is not None:
+            save_build_state(state_path, state, report)
+        report.finish()
+        return report
+
+    async def render_pdf(self, html_path: Path, pdf_path: Path = None, entry: dict = None) -> bytes:
+        """
+        Render a page to PDF on the warm browser and return the PDF bytes.
+
+        With pdf_backend='weasyprint', pages without diagrams to render go
+        through the browser-free backend. The browser (or the render daemon
+        connection) is started on the first call that needs it and reused
+        until close(). Pages in this builder's print directory render as
+        print variants. Without pdf_path the PDF is written under
+        cache_dir. Stage timings go into entry when a report entry is given.
+        """
+        import generate_pdfs_enhanced as pdf
+
+        if self._pool is None:
+            memory_budget = int(pdf.detect_memory_limit() * pdf.MEMORY_BUDGET_FRACTION)
+            max_pages = self.max_pages or max(1, min(pdf.detect_cpu_limit(),
+                                                     memory_budget // pdf.PAGE_MEMORY_ESTIMATE))
+            limiter = pdf.AdaptiveLimiter(max_pages, memory_budget)
+            self._pool = pdf.RenderPool(limiter, stream_pdf=self.stream_pdf,
+                                        print_dir=self.docs_dir / OUTPUT_VARIANTS['print'].directory,
+                                        chunk_dir=self.cache_dir / 'pdf-chunks')
+            self._backends = pdf.pdf_backends(self._pool, self.pdf_backend)
+            self._monitor = asyncio.create_task(limiter.monitor())
+
+        html_path = Path(html_path)
+        if pdf_path is None:
+            pdf_path = self.cache_dir / 'builder-pdf' / html_path.with_suffix('.pdf').name
+        pdf_path = Path(pdf_path)
+        pdf_path.parent.mkdir(parents=True, exist_ok=True)
+        entry = entry if entry is not None else BuildReport('pdf').document(pdf_path.name)
+        await pdf.render_document(self._backends, html_path, pdf_path, False, entry)
+        return pdf_path.read_bytes()
+
+    async def close(self):
+        """Stop the browser, if one was started."""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+            self._backends = None
@@ -4,20 +4,41 @@ Securaa Documentation Generator
 Generates HTML and PDF documentation from Markdown files with properly rendered Mermaid diagrams.
 """
 
-import asyncio
+import argparse
+import filecmp
+import functools
+import hashlib
+import html
 import os
+import posixpath
 import re
 import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 from string import Template
-import markdown
-from markdown.extensions import codehilite, fenced_code, tables, toc
+from urllib.parse import quote, unquote
+
+from build_report import (REPORT_DIR, BuildReport, add_report_arguments, count_blocks, finish_report,
+                          load_report, stage_timer)
+from pdf_styles import PDF_CSS
+from service_worker import MANIFEST_NAME, SERVICE_WORKER_NAME, precache_manifest, render_service_worker
+from sharding import load_manifests, manifest_path, select_shard, verify_manifests, write_manifest
 
 # Configuration
 DOCS_DIR = Path('docs')
 PDF_DIR = DOCS_DIR / 'pdf'
+PRINT_DIR = DOCS_DIR / 'print'
 ROOT_DIR = Path('.')
+BUILD_STATE_PATH = Path('.doc-cache') / 'html-build-state.json'
+PARSE_CACHE_DIR = Path('.doc-cache') / 'parsed'   # converted documents, reused by --incremental
+CORPUS_INDEX_PATH = Path('.doc-cache') / 'corpus.db'   # queried with corpus_index.py
+MERMAID_VERSION = '10.9.1'   # loaded from the CDN by pages; part of the diagram cache version
 
 # Markdown files to process (order matters for index generation)
 MD_FILES = [
@@ -47,6 +68,71 @@ MD_FILES = [
     ('securaa-information-security-risk-assesment-process.md', 'Information Security Risk Assessment'),
 ]
 
+# Streaming builds: markdown files discovered under --source-dir, and the first heading used as title
+MD_TITLE_PATTERN = re.compile(r'^#\s+(.+?)\s*#*\s*$')
+SKIP_DIRS = {'venv', 'node_modules', '__pycache__'}
+
+# Navigation bar links (relative to the docs root) on every page; --source-dir
+# builds of other corpora link only to their generated index
+SITE_NAV = (
+    ('index.html', 'Home'),
+    ('securaa-platform-high-level-design.html', 'Platform'),
+    ('securaa-playbook-high-level-design.html', 'Playbook'),
+    ('securaa-siem-high-level-design.html', 'SIEM'),
+    ('securaa-user-high-level-design.html', 'User Service'),
+    ('securaa-custom-services-high-level-design.html', 'Custom Services'),
+    ('sia-service-high-level-design.html', 'SIA Service'),
+    ('securaa-ris-high-level-design.html', 'RIS'),
+)
+CORPUS_NAV = (('index.html', 'Home'),)
+
+# Mermaid blocks and Python-side diagram validation
+MERMAID_DIAGRAM_TYPES = {
+    'graph': 'flowchart', 'flowchart': 'flowchart', 'flowchart-elk': 'flowchart',
+    'sequenceDiagram': 'sequence',
+    'classDiagram': 'class', 'classDiagram-v2': 'class',
+    'stateDiagram': 'state', 'stateDiagram-v2': 'state',
+    'erDiagram': 'er',
+    'gantt': 'other', 'pie': 'other', 'journey': 'other', 'gitGraph': 'other',
+    'mindmap': 'other', 'timeline': 'other', 'quadrantChart': 'other',
+    'requirementDiagram': 'other', 'xychart-beta': 'other', 'sankey-beta': 'other',
+    'block-beta': 'other', 'C4Context': 'other', 'C4Container': 'other',
+    'C4Component': 'other', 'C4Dynamic': 'other', 'C4Deployment': 'other',
+}
+MERMAID_BRACKETS = {'(': ')', '[': ']', '{': '}'}
+FLOWCHART_KEYWORDS = ('classDef ', 'class ', 'style ', 'linkStyle ', 'click ', 'direction ')
+FLOWCHART_TEXT_LINK = re.compile(r'(?:--|==|-\.)\s+[^|]*?\s*(?:-{2,}>|-{3,}|={2,}>|={3,}|\.-+>|\.-+)')
+FLOWCHART_LINK = re.compile(r'\s*(?:<?-{2,}[>ox]|<?-{3,}|<?={2,}[>ox]|={3,}|<?-\.+->?|~{3,})\s*')
+FLOWCHART_NODE_ID = re.compile(r'[\w.:-]+')
+SEQUENCE_BLOCKS = ('loop', 'alt', 'opt', 'par', 'critical', 'break', 'rect', 'box')
+SEQUENCE_BLOCK_CONTINUATIONS = ('else', 'and', 'option')
+SEQUENCE_MESSAGE = re.compile(r'^(.*?)\s*(<<-{1,2}>>|-{1,2}>>|-{1,2}>|-{1,2}x|-{1,2}\))\s*[+-]?\s*([^:]*?)\s*(?::.*)?$')
+SEQUENCE_PARTICIPANT = re.compile(r'^(?:participant|actor)\s+(\S+)')
+CLASS_RELATION = re.compile(r'^(\S+)\s*(?:"[^"]*"\s*)?(<\|--|\*--|o--|-->|--\*|--o|--\|>|\.\.>|\.\.\|>|<\.\.|<--|--|\.\.)\s*(?:"[^"]*"\s*)?(\S+)')
+CLASS_DECLARATION = re.compile(r'^class\s+([\w~,<>]+)')
+ER_RELATION = re.compile(r'^([\w-]+)\s+[|}o][|o]?(?:--|\.\.)[|o{][|{]?\s+([\w-]+)')
+ER_ENTITY = re.compile(r'^([\w-]+)\s*\{')
+STATE_TRANSITION = re.compile(r'^(\S+)\s*-->\s*([^:\s]+)')
+
+# Link validation: id/href attributes in generated pages, and hrefs that leave the docs site
+LINK_ATTR_PATTERN = re.compile(r'\s(id|href)="([^"]*)"')
+EXTERNAL_LINK_PATTERN = re.compile(r'^(?:[a-zA-Z][a-zA-Z0-9+.-]*:|//)')
+
+# Section pagination: large documents are split at <h2> boundaries
+SECTION_HEADING_PATTERN = re.compile(r'<h2(?=[\s>])')
+SECTION_HEADING_ID_PATTERN = re.compile(r'<h2[^>]*\sid="([^"]*)"[^>]*>(.*?)</h2>', re.S)
+FRAGMENT_HREF_PATTERN = re.compile(r'href="#([^"]*)"')
+# href/src values that are relative paths (not URLs, root-relative paths or #fragments)
+RELATIVE_URL_ATTR_PATTERN = re.compile(r'(\s(?:href|src)=")(?![a-zA-Z][a-zA-Z0-9+.-]*:|//|/|#|")')
+TAG_PATTERN = re.compile(r'<[^>]+>')
+ELEMENT_PATTERN = re.compile(r'<[a-zA-Z]')
+
+# Code highlighting modes: full is codehilite's Pygments markup, compact merges adjacent
+# tokens of one class and unwraps whitespace (highlighting.py), lazy emits plain blocks
+# that the page highlights in the browser as they scroll into view
+HIGHLIGHT_MODES = ('full', 'compact', 'lazy')
+DEFAULT_HIGHLIGHT = 'full'
+
 # Enhanced CSS with better Mermaid diagram styling
 CSS_STYLES = """
 :root {
@@ -342,6 +428,65 @@ blockquote p:last-child {
     margin: 0 auto;
 }
 
+/* Diagrams that failed validation, or failed or overran their budget in the
+   browser, are shown as source */
+.mermaid-invalid,
+.mermaid-fallback {
+    border: 1px solid var(--error-color);
+    border-left-width: 4px;
+}
+
+.mermaid-fallback::before {
+    content: attr(data-reason);
+    display: block;
+    margin-bottom: 0.5rem;
+    color: var(--error-color);
+    font-family: 'Inter', sans-serif;
+    font-weight: 600;
+}
+
+/* Paginated documents: sticky section TOC beside the current section */
+.section-layout {
+    display: grid;
+    grid-template-columns: 15rem minmax(0, 1fr);
+    gap: 2rem;
+    align-items: start;
+}
+
+.section-toc {
+    position: sticky;
+    top: 120px;
+    max-height: calc(100vh - 140px);
+    overflow-y: auto;
+    margin-bottom: 0;
+}
+
+.section-toc li.current a {
+    color: var(--primary-color);
+    font-weight: 600;
+}
+
+.section-pager {
+    display: flex;
+    justify-content: space-between;
+    gap: 1rem;
+    margin-top: 3rem;
+    padding-top: 1.5rem;
+    border-top: 2px solid var(--border-color);
+}
+
+@media (max-width: 1100px) {
+    .section-layout {
+        display: block;
+    }
+
+    .section-toc {
+        position: static;
+        max-height: none;
+        margin-bottom: 2rem;
+    }
+}
+
 /* Ensure diagrams scale properly */
 .mermaid[data-processed="true"] {
     min-height: auto;
@@ -440,7 +585,7 @@ hr {
 
 /* Print Styles */
 @media print {
-    .main-header, .documentation-nav, .footer {
+    .main-header, .documentation-nav, .footer, .section-toc, .section-pager {
         display: none !important;
     }
 
@@ -641,6 +786,8 @@ HTML_TEMPLATE = Template("""<!DOCTYPE html>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <meta name="description" content="Securaa Platform Documentation - $title">
+    <meta name="source-digest" content="$source">
+    <meta name="document-part" content="$part">
     <title>$title - Securaa Documentation</title>
     <link rel="preconnect" href="https://fonts.googleapis.com">
     <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
@@ -661,14 +808,7 @@ $css
 
     <nav class="documentation-nav">
         <div class="nav-links">
-            <a href="index.html">Home</a>
-            <a href="securaa-platform-high-level-design.html">Platform</a>
-            <a href="securaa-playbook-high-level-design.html">Playbook</a>
-            <a href="securaa-siem-high-level-design.html">SIEM</a>
-            <a href="securaa-user-high-level-design.html">User Service</a>
-            <a href="securaa-custom-services-high-level-design.html">Custom Services</a>
-            <a href="sia-service-high-level-design.html">SIA Service</a>
-            <a href="securaa-ris-high-level-design.html">RIS</a>
+$nav
         </div>
     </nav>
 
@@ -681,10 +821,9 @@ $css
         <p>Documentation generated on $date</p>
     </footer>
 
-    <script src="https://cdn.jsdelivr.net/npm/mermaid@10/dist/mermaid.min.js"></script>
     <script>
-        mermaid.initialize({
-            startOnLoad: true,
+        var mermaidConfig = {
+            startOnLoad: false,
             theme: 'base',
             themeVariables: {
                 primaryColor: '#4f46e5',
@@ -750,23 +889,308 @@ $css
             },
             securityLevel: 'loose',
             logLevel: 'error'
-        });
-
-        // Re-render mermaid diagrams after page load for better sizing
-        window.addEventListener('load', function() {
-            setTimeout(function() {
-                document.querySelectorAll('.mermaid').forEach(function(el) {
-                    if (el.getAttribute('data-processed') !== 'true') {
-                        mermaid.init(undefined, el);
+        };
+
+        // Rendered diagrams are kept in localStorage under a hash of their source and mermaidConfig,
+        // so repeat visits show them without loading Mermaid at all. The cache holds up to 3M
+        // characters, dropping the least recently used diagrams first, and is cleared when a page
+        // from a different build (generator templates and styles) is opened. Automated (PDF)
+        // rendering neither reads nor writes it.
+        var mermaidCache = (function() {
+            var prefix = 'mermaid-svg:';
+            var limit = 3000000;
+            var version = '$diagram_cache_version';
+            var storage = null;
+            var index = null;
+            try {
+                storage = navigator.webdriver ? null : window.localStorage;
+                index = storage && JSON.parse(storage.getItem(prefix + 'index'));
+            } catch (error) {
+                storage = null;
+            }
+            if (!storage) {
+                return null;
+            }
+            if (!index || index.version !== version) {
+                Object.keys(storage).forEach(function(key) {
+                    if (key.indexOf(prefix) === 0) {
+                        storage.removeItem(key);
                     }
                 });
-            }, 100);
+                index = { version: version, entries: {} };
+            }
+            // 64-bit string hash (two 32-bit multiply-xorshift lanes)
+            function hash(text) {
+                var h1 = 0xdeadbeef, h2 = 0x41c6ce57;
+                for (var i = 0; i < text.length; i++) {
+                    var c = text.charCodeAt(i);
+                    h1 = Math.imul(h1 ^ c, 2654435761);
+                    h2 = Math.imul(h2 ^ c, 1597334677);
+                }
+                h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+                h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+                return (h2 >>> 0).toString(16) + '-' + (h1 >>> 0).toString(16) + '-' + text.length;
+            }
+            function evict(room) {
+                var entries = index.entries;
+                var keys = Object.keys(entries).sort(function(a, b) { return entries[a].used - entries[b].used; });
+                var total = keys.reduce(function(sum, key) { return sum + entries[key].size; }, 0);
+                while (keys.length && total + room > limit) {
+                    var key = keys.shift();
+                    total -= entries[key].size;
+                    storage.removeItem(prefix + key);
+                    delete entries[key];
+                }
+            }
+            var config = JSON.stringify(mermaidConfig);
+            return {
+                key: function(source) {
+                    return hash(config + '\\n' + source);
+                },
+                get: function(key) {
+                    var svg = index.entries[key] ? storage.getItem(prefix + key) : null;
+                    if (svg) {
+                        index.entries[key].used = Date.now();
+                    }
+                    return svg;
+                },
+                put: function(key, svg) {
+                    if (svg.length > limit / 4) {
+                        return;
+                    }
+                    evict(svg.length);
+                    try {
+                        storage.setItem(prefix + key, svg);
+                        index.entries[key] = { size: svg.length, used: Date.now() };
+                    } catch (error) {
+                        // Over the browser's quota: leave this diagram uncached
+                    }
+                },
+                // Other tabs may have saved the index since this page read it: merge their entries
+                // (keeping each diagram's latest use) and drop any whose SVG another tab evicted,
+                // so tabs neither forget each other's diagrams nor keep entries for missing ones.
+                // A page from a different build has taken the cache over, so this one leaves it.
+                save: function() {
+                    try {
+                        var stored = JSON.parse(storage.getItem(prefix + 'index'));
+                        if (stored && stored.version !== version) {
+                            return;
+                        }
+                        var entries = index.entries;
+                        Object.keys(stored ? stored.entries : {}).forEach(function(key) {
+                            if (!entries[key] || entries[key].used < stored.entries[key].used) {
+                                entries[key] = stored.entries[key];
+                            }
+                        });
+                        Object.keys(entries).forEach(function(key) {
+                            if (storage.getItem(prefix + key) === null) {
+                                delete entries[key];
+                            }
+                        });
+                        evict(0);
+                        storage.setItem(prefix + 'index', JSON.stringify(index));
+                    } catch (error) {
+                    }
+                }
+            };
+        })();
+
+        // Cached diagrams are shown straight away. Mermaid is only loaded when some are not,
+        // and those are rendered with one mermaid.run() call after load. Diagrams render in
+        // document order, so each success (postRenderCallback) or error (parseError) belongs
+        // to the next diagram in the list. A diagram that fails, or takes longer than the
+        // budget in ms (the PDF generator may set MERMAID_RENDER_BUDGET), is replaced by its
+        // source, so the page stays usable. window.mermaidRendered resolves with the stats
+        // when all are done; the pass is measured as 'mermaid-render' in the timeline.
+        window.mermaidStats = { done: false, ms: 0, cached: 0, diagrams: [] };
+        window.mermaidRendered = new Promise(function(resolve) {
+            var stats = window.mermaidStats;
+            var decoder = document.createElement('textarea');
+            var nodes = [];
+            var sources = [];
+            var keys = [];
+            document.querySelectorAll('div.mermaid').forEach(function(el) {
+                decoder.innerHTML = el.innerHTML;
+                var source = decoder.value.trim();
+                var key = mermaidCache && mermaidCache.key(source);
+                var svg = key && mermaidCache.get(key);
+                if (svg) {
+                    el.innerHTML = svg;
+                    el.setAttribute('data-processed', 'true');
+                    stats.cached++;
+                    return;
+                }
+                nodes.push(el);
+                sources.push(source);
+                keys.push(key);
+            });
+            if (nodes.length) {
+                // Inserted before load, so the load event waits for it
+                var script = document.createElement('script');
+                script.src = 'https://cdn.jsdelivr.net/npm/mermaid@$mermaid_version/dist/mermaid.min.js';
+                script.onload = function() { mermaid.initialize(mermaidConfig); };
+                document.body.appendChild(script);
+            }
+            window.addEventListener('load', function() {
+                var budget = window.MERMAID_RENDER_BUDGET || 10000;
+                var last = performance.now();
+                function settle(error) {
+                    var now = performance.now();
+                    var el = nodes[stats.diagrams.length];
+                    if (!el) {
+                        return;
+                    }
+                    var stat = { line: Number(el.getAttribute('data-line')) || null, status: 'ok',
+                                 ms: Math.round(now - last) };
+                    if (error) {
+                        stat.status = 'error';
+                        stat.error = String(error && error.message || error);
+                    } else if (stat.ms > budget) {
+                        stat.status = 'over-budget';
+                    }
+                    stats.diagrams.push(stat);
+                    last = now;
+                }
+                var failure = 'not rendered';
+                performance.mark('mermaid-start');
+                if (window.mermaid) {
+                    mermaid.parseError = function(error) { settle(error || 'render failed'); };
+                }
+                var run = !nodes.length ? Promise.resolve() :
+                    !window.mermaid ? Promise.reject(new Error('Mermaid did not load')) : mermaid.run({
+                    nodes: nodes,
+                    suppressErrors: true,
+                    postRenderCallback: function() { settle(null); }
+                });
+                run.catch(function(error) {
+                    failure = String(error && error.message || error);
+                }).then(function() {
+                    performance.mark('mermaid-end');
+                    stats.ms = Math.round(performance.measure('mermaid-render', 'mermaid-start', 'mermaid-end').duration);
+                    while (stats.diagrams.length < nodes.length) {
+                        settle(failure);
+                    }
+                    // Error diagrams Mermaid leaves behind in <body>
+                    document.querySelectorAll('body > [id^="dmermaid"]').forEach(function(el) { el.remove(); });
+                    stats.diagrams.forEach(function(stat, index) {
+                        if (stat.status === 'ok') {
+                            if (mermaidCache) {
+                                mermaidCache.put(keys[index], nodes[index].innerHTML);
+                            }
+                            return;
+                        }
+                        var fallback = document.createElement('pre');
+                        fallback.className = 'mermaid-fallback';
+                        fallback.setAttribute('data-reason', stat.status === 'over-budget' ?
+                            'Diagram took too long to render' : 'Diagram failed to render');
+                        fallback.textContent = sources[index];
+                        nodes[index].replaceWith(fallback);
+                    });
+                    if (mermaidCache) {
+                        mermaidCache.save();
+                    }
+                    stats.done = true;
+                    resolve(stats);
+                });
+            });
         });
     </script>
+    <script>
+        // Lazy highlighting (--highlight lazy): code blocks arrive as plain <pre class="highlight">
+        // and are highlighted with highlight.js as they scroll into view. Print and automated
+        // (PDF) rendering leave them plain.
+        (function() {
+            var blocks = document.querySelectorAll('pre.highlight > code');
+            if (!blocks.length || navigator.webdriver || window.matchMedia('print').matches) {
+                return;
+            }
+            var loaded = null;
+            function load() {
+                if (!loaded) {
+                    var style = document.createElement('link');
+                    style.rel = 'stylesheet';
+                    style.href = 'https://cdn.jsdelivr.net/npm/@highlightjs/cdn-assets@11/styles/vs2015.min.css';
+                    document.head.appendChild(style);
+                    loaded = new Promise(function(resolve, reject) {
+                        var script = document.createElement('script');
+                        script.src = 'https://cdn.jsdelivr.net/npm/@highlightjs/cdn-assets@11/highlight.min.js';
+                        script.onload = resolve;
+                        script.onerror = reject;
+                        document.head.appendChild(script);
+                    });
+                }
+                return loaded;
+            }
+            var observer = new IntersectionObserver(function(entries) {
+                entries.forEach(function(entry) {
+                    if (!entry.isIntersecting) {
+                        return;
+                    }
+                    observer.unobserve(entry.target);
+                    load().then(function() { hljs.highlightElement(entry.target); }, function() {});
+                });
+            }, { rootMargin: '200px 0px' });
+            blocks.forEach(function(block) { observer.observe(block); });
+        })();
+    </script>
+    <script>
+        // Offline copy of the site (sw.js). Not available from file:// or to automated (PDF) rendering.
+        if ('serviceWorker' in navigator && location.protocol !== 'file:' && !navigator.webdriver) {
+            navigator.serviceWorker.register('${root}sw.js');
+        }
+    </script>
 </body>
 </html>
 """)
 
+# Page template split around the body, for streaming builds
+PAGE_HEAD_TEMPLATE, PAGE_TAIL_TEMPLATE = (Template(part) for part in HTML_TEMPLATE.template.split('$content'))
+
+# Print variant: same page with PDF_CSS already in the head, served from PRINT_DIR.
+# Its links are rebased onto the docs root (see rebase_links), not through a <base>
+# tag, which would also send the page's own #fragment links to the docs root
+PRINT_TEMPLATE = Template(HTML_TEMPLATE.template.replace(
+    '<head>\n',
+    '<head>\n    <meta name="robots" content="noindex">\n',
+    1
+))
+PRINT_CSS = CSS_STYLES + PDF_CSS
+
+# Dark theme variant: the screen page with dark colours and Mermaid's dark theme, served
+# from docs/dark/ with its links rebased like the print variant's
+MERMAID_THEME_PATTERN = re.compile(r"theme: 'base',\n\s*themeVariables: \{.*?\},\n", re.S)
+DARK_TEMPLATE = Template(MERMAID_THEME_PATTERN.sub("theme: 'dark',\n", HTML_TEMPLATE.template, count=1))
+DARK_CSS = CSS_STYLES + """
+:root {
+    --primary-color: #818cf8;
+    --primary-dark: #6366f1;
+    --primary-light: #a5b4fc;
+    --text-primary: #e5e7eb;
+    --text-secondary: #9ca3af;
+    --text-muted: #6b7280;
+    --bg-primary: #111827;
+    --bg-secondary: #1f2937;
+    --bg-tertiary: #374151;
+    --border-color: #374151;
+}
+
+.mermaid {
+    background: var(--bg-secondary);
+}
+"""
+
+# Stamped into pages so browsers drop diagrams cached by pages of a build with other templates,
+# styles or Mermaid version
+DIAGRAM_CACHE_VERSION = hashlib.sha256(
+    (HTML_TEMPLATE.template + CSS_STYLES + DARK_CSS + MERMAID_VERSION).encode('utf-8')).hexdigest()[:16]
+
+# Embed variant: a bare fragment for the internal wiki, which brings its own page chrome and styles
+EMBED_TEMPLATE = Template("""<article class="securaa-doc" data-title="$title">
+<!-- toc -->
+$content
+</article>
+""")
+
 # Index Page Template
 INDEX_TEMPLATE = Template("""<!DOCTYPE html>
 <html lang="en">
@@ -929,72 +1353,528 @@ $css
         <p>&copy; $year Securaa Security Platform. All rights reserved.</p>
         <p>Documentation generated on $date</p>
     </footer>
+    <script>
+        // Offline copy of the site (sw.js). Not available from file:// or to automated (PDF) rendering.
+        if ('serviceWorker' in navigator && location.protocol !== 'file:' && !navigator.webdriver) {
+            navigator.serviceWorker.register('sw.js');
+        }
+    </script>
 </body>
 </html>
 """)
 
 
-def process_mermaid_blocks(content: str) -> str:
+def check_brackets(line: str, asymmetric: bool = True) -> tuple:
     """
-    Convert markdown mermaid code blocks to HTML div elements.
+    Check bracket and quote balance on one diagram line.
+
+    Returns (error message or None, skeleton) where the skeleton is the line
+    with quoted strings, bracketed labels and |edge labels| removed, leaving
+    node IDs and link tokens for edge parsing. With asymmetric set, a '>'
+    directly after a node ID opens a flowchart node shape closed by ']'.
     """
-    # Pattern to match mermaid code blocks
-    mermaid_pattern = r'```mermaid\s*\n([\s\S]*?)```'
+    skeleton = []
+    stack = []
+    in_quote = False
+    in_pipe = False
+    previous = ''
+    for char in line:
+        if in_quote:
+            in_quote = char != '"'
+        elif char == '"':
+            in_quote = True
+        elif in_pipe:
+            in_pipe = char != '|'
+        elif stack:
+            if char in MERMAID_BRACKETS:
+                stack.append(MERMAID_BRACKETS[char])
+            elif char in ')]}':
+                if char != stack.pop():
+                    return f"mismatched '{char}'", ''
+        elif char in MERMAID_BRACKETS:
+            stack.append(MERMAID_BRACKETS[char])
+        elif asymmetric and char == '>' and (previous.isalnum() or previous == '_'):
+            stack.append(']')
+        elif char in ')]}':
+            return f"unmatched '{char}'", ''
+        elif char == '|':
+            in_pipe = True
+        else:
+            skeleton.append(char)
+        previous = char
+    if in_quote:
+        return 'unterminated string', ''
+    if stack:
+        return f"unclosed bracket, expected '{stack[-1]}'", ''
+    return None, ''.join(skeleton)
+
+
+def check_flowchart(lines: list, errors: list) -> tuple:
+    """Validate flowchart statements and subgraph/end balance; returns (nodes, edges)."""
+    nodes = set()
+    edges = 0
+    subgraphs = []
+    for number, line in lines:
+        if line == 'end':
+            if subgraphs:
+                subgraphs.pop()
+            else:
+                errors.append((number, "'end' without matching 'subgraph'"))
+            continue
+        if line.startswith('subgraph'):
+            subgraphs.append(number)
+            continue
+        if line.startswith(FLOWCHART_KEYWORDS):
+            continue
 
-    def replace_mermaid(match):
-        diagram_content = match.group(1).strip()
-        # Wrap in a div with mermaid class
-        return f'<div class="mermaid">\n{diagram_content}\n</div>'
+        error, skeleton = check_brackets(line)
+        if error:
+            errors.append((number, error))
+            continue
+        skeleton = FLOWCHART_TEXT_LINK.sub(' --> ', skeleton.replace(';', ' '))
+        segments = FLOWCHART_LINK.split(skeleton)
+        if len(segments) > 1:
+            if not segments[0].strip():
+                errors.append((number, 'link without a source node'))
+                continue
+            if not segments[-1].strip():
+                errors.append((number, 'link without a target node'))
+                continue
+            edges += len(segments) - 1
+        for segment in segments:
+            for ref in segment.split('&'):
+                match = FLOWCHART_NODE_ID.match(ref.strip())
+                if match:
+                    nodes.add(match.group(0))
+    for number in subgraphs:
+        errors.append((number, "'subgraph' without matching 'end'"))
+    return len(nodes), edges
+
+
+def check_sequence(lines: list, errors: list) -> tuple:
+    """Validate sequence diagram blocks and messages; returns (participants, messages)."""
+    participants = set()
+    messages = 0
+    blocks = []
+    for number, line in lines:
+        keyword = line.split()[0]
+        if keyword in SEQUENCE_BLOCKS:
+            blocks.append(number)
+        elif keyword in SEQUENCE_BLOCK_CONTINUATIONS:
+            if not blocks:
+                errors.append((number, f"'{keyword}' outside of a block"))
+        elif keyword == 'end':
+            if blocks:
+                blocks.pop()
+            else:
+                errors.append((number, "'end' without an open block"))
+        elif SEQUENCE_PARTICIPANT.match(line):
+            participants.add(SEQUENCE_PARTICIPANT.match(line).group(1))
+        elif keyword not in ('Note', 'note', 'activate', 'deactivate', 'autonumber', 'title'):
+            match = SEQUENCE_MESSAGE.match(line)
+            if match:
+                if not match.group(1) or not match.group(3):
+                    errors.append((number, 'message needs a sender and a receiver'))
+                    continue
+                participants.update((match.group(1), match.group(3)))
+                messages += 1
+    for number in blocks:
+        errors.append((number, "block without matching 'end'"))
+    return len(participants), messages
+
+
+def check_braced(lines: list, errors: list, kind: str) -> tuple:
+    """Validate brace balance for class, state and ER diagrams; returns (nodes, edges)."""
+    nodes = set()
+    edges = 0
+    open_braces = []
+    for number, line in lines:
+        error, _ = check_brackets(line.replace('{', '').replace('}', ''), asymmetric=False)
+        if kind != 'er' and error:
+            errors.append((number, error))
+        if line.endswith('{'):
+            open_braces.append(number)
+        if line == '}' or (line.endswith('}') and '{' not in line):
+            if open_braces:
+                open_braces.pop()
+            else:
+                errors.append((number, "'}' without matching '{'"))
+            continue
 
-    return re.sub(mermaid_pattern, replace_mermaid, content)
+        relation = {'class': CLASS_RELATION, 'state': STATE_TRANSITION, 'er': ER_RELATION}[kind].match(line)
+        if relation:
+            edges += 1
+            nodes.update(ref for ref in (relation.group(1), relation.groups()[-1]) if ref != '[*]')
+            continue
+        declaration = {'class': CLASS_DECLARATION, 'state': None, 'er': ER_ENTITY}[kind]
+        match = declaration.match(line) if declaration else None
+        if match:
+            nodes.add(match.group(1))
+    for number in open_braces:
+        errors.append((number, "'{' without matching '}'"))
+    return len(nodes), edges
 
 
-def convert_md_to_html(md_content: str, title: str) -> str:
+def validate_mermaid(source: str, first_line: int = 1) -> dict:
     """
-    Convert markdown content to HTML with proper formatting.
+    Validate one Mermaid diagram in Python, before it ever reaches a browser.
+
+    Checks the diagram-type header, block balance (subgraph/end, sequence
+    blocks, braces) and node/edge syntax, and counts nodes and edges.
+    Returns {'line', 'type', 'nodes', 'edges', 'errors'} where errors is a
+    list of (line number, message) relative to the markdown file.
     """
-    # Process mermaid blocks first (before markdown processing)
-    content = process_mermaid_blocks(md_content)
+    lines = []
+    in_front_matter = False
+    for offset, raw_line in enumerate(source.split('\n')):
+        line = raw_line.strip()
+        if line == '---' and not lines:
+            in_front_matter = not in_front_matter
+            continue
+        if in_front_matter or not line or line.startswith('%%'):
+            continue
+        lines.append((first_line + offset, line))
+
+    diagram = {'line': first_line, 'type': None, 'nodes': 0, 'edges': 0, 'errors': []}
+    if not lines:
+        diagram['errors'].append((first_line, 'empty diagram'))
+        return diagram
+
+    header_line, header = lines[0]
+    diagram_type = header.split()[0].rstrip(';')
+    if diagram_type not in MERMAID_DIAGRAM_TYPES:
+        diagram['errors'].append((header_line, f"unknown diagram type '{diagram_type}'"))
+        return diagram
+    diagram['type'] = diagram_type
+
+    family = MERMAID_DIAGRAM_TYPES[diagram_type]
+    body = lines[1:]
+    errors = diagram['errors']
+    if family == 'flowchart':
+        diagram['nodes'], diagram['edges'] = check_flowchart(body, errors)
+    elif family == 'sequence':
+        diagram['nodes'], diagram['edges'] = check_sequence(body, errors)
+    elif family in ('class', 'state', 'er'):
+        diagram['nodes'], diagram['edges'] = check_braced(body, errors, family)
+    else:
+        diagram['nodes'] = len(body)
+    return diagram
+
+
+def create_markdown(highlight: str = DEFAULT_HIGHLIGHT):
+    """
+    Create a Markdown converter with the documentation extensions.
 
-    # Configure markdown extensions
-    md = markdown.Markdown(extensions=[
+    Mermaid fences are handled by MermaidExtension, which validates each
+    diagram and leaves the results in md.mermaid_diagrams after convert().
+    Code blocks are highlighted according to highlight (see HIGHLIGHT_MODES).
+    Markdown (and Pygments behind codehilite) is imported on first use, so
+    runs that convert nothing, such as a no-op incremental build, start fast.
+    """
+    import markdown
+    from mermaid_extension import MermaidExtension
+    codehilite = {
+        'css_class': 'highlight',
+        'guess_lang': True,
+    }
+    if highlight == 'compact':
+        from highlighting import CompactHtmlFormatter
+        codehilite['pygments_formatter'] = CompactHtmlFormatter
+    elif highlight == 'lazy':
+        # Escaped <pre class="highlight"><code class="language-..."> for the page script
+        codehilite['use_pygments'] = False
+    return markdown.Markdown(extensions=[
+        MermaidExtension(validate=validate_mermaid),
         'tables',
         'fenced_code',
         'codehilite',
         'toc',
         'sane_lists',
     ], extension_configs={
-        'codehilite': {
-            'css_class': 'highlight',
-            'guess_lang': True,
-        },
+        'codehilite': codehilite,
         'toc': {
             'permalink': False,
             'toc_depth': 4,
         }
     })
 
-    # Convert markdown to HTML
-    html_content = md.convert(content)
 
-    # Generate full HTML document
-    now = datetime.now()
-    full_html = HTML_TEMPLATE.substitute(
+def parse_markdown(md_content: str, md=None, highlight: str = DEFAULT_HIGHLIGHT) -> dict:
+    """
+    Convert a document once into the intermediate every output renders from:
+    {'body', 'toc_tokens', 'diagrams'}. A converter from create_markdown() can
+    be passed in to be reused, else one is created for highlight.
+    """
+    md = md or create_markdown(highlight)
+    md.reset()
+    body = md.convert(md_content)
+    return {'body': body, 'toc_tokens': md.toc_tokens, 'diagrams': md.mermaid_diagrams}
+
+
+def convert_md_body(md_content: str, diagrams: list = None) -> str:
+    """
+    Convert markdown content to the HTML body of a page.
+    Validation results for each Mermaid block are appended to diagrams if given.
+    """
+    parsed = parse_markdown(md_content)
+    if diagrams is not None:
+        diagrams.extend(parsed['diagrams'])
+    return parsed['body']
+
+
+@functools.lru_cache(maxsize=None)
+def converter_fingerprint(highlight: str = DEFAULT_HIGHLIGHT) -> str:
+    """
+    Hash what a converted document depends on besides its markdown.
+    Looking up the package versions is a large share of a no-op build, so
+    callers ask for it only once a document is converted or indexed.
+    """
+    from importlib.metadata import version
+    digest = hashlib.sha256()
+    for name in (Path(__file__).name, 'mermaid_extension.py', 'highlighting.py'):
+        digest.update(Path(__file__).with_name(name).read_bytes())
+    digest.update(f"{version('markdown')} {version('pygments')} {highlight}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cached_parse(md_content: str, digest: str, html_filename: str, entry: dict, cache_dir: Path = None,
+                 parse=parse_markdown, fingerprint: str = None) -> dict:
+    """
+    Parse a document, or load its intermediate from cache_dir when neither its
+    markdown (digest) nor the converter (fingerprint) changed since it was saved.
+    Hits and misses are counted in the report entry.
+    """
+    if cache_dir is None:
+        return parse(md_content)
+    key = hashlib.sha256(f'{fingerprint}{digest}'.encode('utf-8')).hexdigest()
+    cache_path = cache_dir / f'{html_filename}.json'
+    try:
+        cached = json.loads(cache_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        cached = None
+    if cached and cached.get('key') == key:
+        entry['cache_hits'] += 1
+        return cached['parsed']
+
+    parsed = parse(md_content)
+    entry['cache_misses'] += 1
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    tmp_path.write_text(json.dumps({'key': key, 'parsed': parsed}, separators=(',', ':')), encoding='utf-8')
+    os.replace(tmp_path, cache_path)
+    return parsed
+
+
+def build_date() -> datetime:
+    """
+    Date stamped into generated pages: SOURCE_DATE_EPOCH when set, so identical
+    inputs give byte-identical output, else the current time.
+    """
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if epoch:
+        return datetime.fromtimestamp(int(epoch), timezone.utc)
+    return datetime.now()
+
+
+def git_commit_time() -> str:
+    """Commit time of HEAD as a Unix timestamp, for SOURCE_DATE_EPOCH."""
+    return subprocess.run(['git', 'log', '-1', '--format=%ct'], check=True, capture_output=True,
+                          text=True).stdout.strip()
+
+
+def write_if_changed(path: Path, content: str, entry: dict = None) -> bool:
+    """
+    Write a file only if its content differs from what is already on disk.
+
+    Unchanged files keep their modification time, so rsync, CDN caches and the
+    PDF generator see only real changes. Returns True if the file was written.
+    """
+    data = content.encode('utf-8')
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            if entry is not None:
+                entry['unchanged_files'] = entry.get('unchanged_files', 0) + 1
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return True
+
+
+def replace_if_changed(tmp_path: Path, path: Path, entry: dict = None) -> bool:
+    """Move a freshly written file into place unless path already has the same bytes."""
+    if path.exists() and filecmp.cmp(tmp_path, path, shallow=False):
+        tmp_path.unlink()
+        if entry is not None:
+            entry['unchanged_files'] = entry.get('unchanged_files', 0) + 1
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def page_root(html_filename: str, directory: str = '') -> str:
+    """Relative path to the docs root from an output page, written under directory if given."""
+    depth = html_filename.count('/') + (directory.strip('/').count('/') + 1 if directory else 0)
+    return '../' * depth
+
+
+def render_nav(links: tuple, root: str = '') -> str:
+    """The navigation bar's links, as seen from a page root levels below the docs root."""
+    return '\n'.join(f'            <a href="{root}{href}">{html.escape(label)}</a>' for href, label in links)
+
+
+def render_page(title: str, html_content: str, template: Template = HTML_TEMPLATE,
+                css: str = CSS_STYLES, root: str = '', source: str = '', part: str = '1/1',
+                nav: tuple = SITE_NAV) -> str:
+    """
+    Wrap a converted body in a page template.
+    root is the relative path from the page to the docs root (e.g. '../'),
+    which the nav links (see SITE_NAV) and the service worker are relative to.
+    source (the digest of the markdown) and part ('2/5' for the second of five
+    pages of a split document) are stamped into the head, so the PDF generator
+    can tell whether a print variant matches the screen page and whether the
+    screen page holds the whole document.
+    """
+    now = build_date()
+    return template.substitute(
         title=title,
-        css=CSS_STYLES,
+        css=css,
         content=html_content,
         date=now.strftime('%B %d, %Y'),
-        year=now.year
+        year=now.year,
+        diagram_cache_version=DIAGRAM_CACHE_VERSION,
+        mermaid_version=MERMAID_VERSION,
+        root=root,
+        nav=render_nav(nav, root),
+        source=source,
+        part=part
     )
 
-    return full_html
+
+def embed_toc(page: str, parsed: dict) -> str:
+    """Fill the embed fragment's TOC with the document's sections, from the parsed TOC tokens."""
+    sections = []
+    pending = list(parsed['toc_tokens'])
+    while pending:
+        token = pending.pop(0)
+        if token['level'] == 2:
+            sections.append(f'    <li><a href="#{token["id"]}">{token["name"]}</a></li>')
+        elif token['level'] < 2:
+            pending[:0] = token['children']
+    toc = '<nav class="securaa-doc-toc">\n<ul>\n' + '\n'.join(sections) + '\n</ul>\n</nav>' if sections else ''
+    return page.replace('<!-- toc -->', toc, 1)
 
 
-def generate_index_page() -> str:
+def rebase_links(body: str, prefix: str = '../') -> str:
+    """Prefix every relative href and src in a page body, for a copy of the page one directory down."""
+    return RELATIVE_URL_ATTR_PATTERN.sub(lambda match: match.group(1) + prefix, body)
+
+
+class OutputVariant:
+    """
+    An extra output rendered from a parsed document: a page template, its CSS
+    and an optional post-processing step on the finished page. Pages are
+    written to directory (relative to the docs root) under the page's own name.
+    With rebase, the body's relative links are rewritten to resolve from there,
+    as they would from the screen page; #fragment links stay on the page.
+    Variants without post-processing are written as a stream in --stream builds.
+    """
+
+    def __init__(self, name: str, directory: str, template: Template, css: str = '', postprocess=None,
+                 rebase: bool = False):
+        self.name = name
+        self.directory = directory
+        self.template = template
+        self.css = css
+        self.postprocess = postprocess
+        self.rebase = rebase
+        self.head_template, self.tail_template = (Template(part) for part in template.template.split('$content'))
+
+    def path(self, docs_dir: Path, html_filename: str) -> Path:
+        return docs_dir / self.directory / html_filename
+
+    def root(self, html_filename: str) -> str:
+        """Relative path to the docs root from this variant of the page."""
+        return page_root(html_filename, self.directory if self.rebase else '')
+
+    def body(self, parsed: dict, html_filename: str = '') -> str:
+        if not self.rebase:
+            return parsed['body']
+        # From the variant's copy of the page back to the directory of the screen page
+        directory = posixpath.dirname(html_filename)
+        return rebase_links(parsed['body'], self.root(html_filename) + (directory + '/' if directory else ''))
+
+    def render(self, title: str, parsed: dict, source: str = '', html_filename: str = '',
+               nav: tuple = SITE_NAV) -> str:
+        page = render_page(title, self.body(parsed, html_filename), self.template, self.css,
+                           self.root(html_filename), source, nav=nav)
+        return self.postprocess(page, parsed) if self.postprocess else page
+
+
+# Output variants besides the screen pages; the print variant is what the PDF generator renders
+OUTPUT_VARIANTS = {
+    'print': OutputVariant('print', 'print', PRINT_TEMPLATE, PRINT_CSS, rebase=True),
+    'dark': OutputVariant('dark', 'dark', DARK_TEMPLATE, DARK_CSS, rebase=True),
+    'embed': OutputVariant('embed', 'embed', EMBED_TEMPLATE, postprocess=embed_toc),
+}
+DEFAULT_VARIANTS = ('print',)
+
+
+def write_offline_support(docs_dir: Path, report: BuildReport):
+    """
+    Write the service worker and its precache manifest for the pages now in docs_dir.
+    """
+    manifest = precache_manifest(docs_dir)
+    for name, content in ((MANIFEST_NAME, json.dumps(manifest, indent=2) + '\n'),
+                          (SERVICE_WORKER_NAME, render_service_worker(manifest))):
+        entry = report.document(name)
+        write_if_changed(docs_dir / name, content, entry)
+        entry['output_bytes'] = len(content.encode('utf-8'))
+    print(f"  Service worker: {len(manifest['entries'])} pages precached (build {manifest['version']})")
+
+
+def write_variants(variants: list, docs_dir: Path, html_filename: str, title: str, parsed: dict,
+                   entry: dict, stream: bool = False, source: str = '', nav: tuple = SITE_NAV) -> list:
+    """
+    Render the named variants of a document from its parsed intermediate,
+    stamped with source, the digest of its markdown, and linking to nav.
+    Returns the written files relative to docs_dir.
+    """
+    files = []
+    for name in variants:
+        variant = OUTPUT_VARIANTS[name]
+        path = variant.path(docs_dir, html_filename)
+        with stage_timer(entry, f'{name}_variant'):
+            if stream and variant.postprocess is None:
+                write_page_stream(path, title, variant.body(parsed, html_filename), variant.head_template,
+                                  variant.tail_template, variant.css, entry, variant.root(html_filename), source,
+                                  nav=nav)
+            else:
+                write_if_changed(path, variant.render(title, parsed, source, html_filename, nav), entry)
+        files.append(path.relative_to(docs_dir).as_posix())
+    return files
+
+
+def convert_md_to_html(md_content: str, title: str, diagrams: list = None) -> str:
+    """
+    Convert markdown content to HTML with proper formatting.
+    Validation results for each Mermaid block are appended to diagrams if given.
+    """
+    return render_page(title, convert_md_body(md_content, diagrams))
+
+
+def generate_index_page(documents: list = None) -> str:
     """
     Generate the index HTML page.
+    With documents, a list of (html_filename, title) from a --source-dir
+    build, the page lists those instead of the Securaa portal's cards.
     """
-    now = datetime.now()
+    if documents is not None:
+        items = '\n'.join(f'<li><a href="{quote(html_filename)}">{html.escape(title)}</a></li>'
+                          for html_filename, title in documents)
+        return render_page('Documentation', f'<h1>Documentation</h1>\n<ul>\n{items}\n</ul>', nav=CORPUS_NAV)
+    now = build_date()
     return INDEX_TEMPLATE.substitute(
         css=CSS_STYLES,
         date=now.strftime('%B %d, %Y'),
@@ -1002,64 +1882,939 @@ def generate_index_page() -> str:
     )
 
 
-def main():
+def split_body_sections(body: str) -> list:
     """
-    Main function to generate all HTML documentation.
+    Split a converted body at its <h2> headings.
+
+    Returns a list of (id, title, html) tuples; anything before the second
+    heading (the document title, intro and table of contents) stays with the
+    first section.
     """
-    print("\n=== Securaa Documentation Generator ===\n")
+    starts = [match.start() for match in SECTION_HEADING_PATTERN.finditer(body)]
+    if len(starts) < 2:
+        return [(None, None, body)]
+    starts[0] = 0
+    sections = []
+    for start, end in zip(starts, starts[1:] + [len(body)]):
+        html_part = body[start:end]
+        match = SECTION_HEADING_ID_PATTERN.search(html_part)
+        section_id = match.group(1) if match else None
+        title = html.unescape(TAG_PATTERN.sub('', match.group(2))).strip() if match else None
+        sections.append((section_id, title, html_part))
+    return sections
+
+
+def part_filename(html_filename: str, number: int) -> str:
+    """Output page for part number of a document; part 1 keeps the document's own name."""
+    if number == 1:
+        return html_filename
+    return f"{html_filename[:-len('.html')]}-part{number}.html"
+
+
+def paginate_body(html_filename: str, title: str, body: str) -> list:
+    """
+    Split a document body into one page per <h2> section.
+
+    Every part gets the same section TOC (with the current section marked),
+    prefetch hints and previous/next links for its neighbours, and a map from
+    every anchor in the document to the part that holds it. In-document links
+    are rewritten to point at the right part at build time; deep links from
+    elsewhere to the first part are forwarded by the map on load.
+    Returns a list of (filename, page title, body) tuples.
+    """
+    sections = split_body_sections(body)
+    if len(sections) == 1:
+        return [(html_filename, title, body)]
+
+    names = [part_filename(html_filename, number) for number in range(1, len(sections) + 1)]
+    links = [posixpath.basename(name) for name in names]
+    anchor_parts = {}
+    for link, (_, _, html_part) in zip(links, sections):
+        anchors, _ = collect_links(html_part)
+        for anchor in anchors:
+            anchor_parts.setdefault(anchor, link)
+    anchor_map = json.dumps(anchor_parts, sort_keys=True, separators=(',', ':')).replace('</', '<\\/')
+
+    parts = []
+    for index, (link, (section_id, section_title, html_part)) in enumerate(zip(links, sections)):
+        def rewrite_fragment(match, link=link):
+            target = anchor_parts.get(unquote(match.group(1)), link)
+            return match.group(0) if target == link else f'href="{target}#{match.group(1)}"'
+
+        toc_items = []
+        for other, (other_id, other_title, _) in zip(links, sections):
+            label = html.escape(other_title or title)
+            href = f'{other}#{other_id}' if other_id else other
+            current = ' class="current"' if other == link else ''
+            toc_items.append(f'<li{current}><a href="{href}">{label}</a></li>')
+
+        neighbours = []
+        pager = []
+        if index > 0:
+            neighbours.append(links[index - 1])
+            pager.append(f'<a rel="prev" href="{links[index - 1]}">&larr; {html.escape(sections[index - 1][1] or title)}</a>')
+        else:
+            pager.append('<span></span>')
+        if index + 1 < len(links):
+            neighbours.append(links[index + 1])
+            pager.append(f'<a rel="next" href="{links[index + 1]}">{html.escape(sections[index + 1][1] or title)} &rarr;</a>')
+
+        part_body = (
+            '<div class="section-layout">\n'
+            '<nav class="toc section-toc">\n<div class="toc-title">Sections</div>\n'
+            f'<ul>\n{chr(10).join(toc_items)}\n</ul>\n</nav>\n'
+            '<div class="section-body">\n'
+            f'{FRAGMENT_HREF_PATTERN.sub(rewrite_fragment, html_part)}\n'
+            f'<nav class="section-pager">{"".join(pager)}</nav>\n'
+            '</div>\n</div>\n'
+            + ''.join(f'<link rel="prefetch" href="{neighbour}">\n' for neighbour in neighbours)
+            + '<script>\n'
+            '(function () {\n'
+            f'    var parts = {anchor_map};\n'
+            '    var id = decodeURIComponent(location.hash.slice(1));\n'
+            '    if (id && !document.getElementById(id) && parts[id]) {\n'
+            '        location.replace(parts[id] + location.hash);\n'
+            '    }\n'
+            '})();\n'
+            '</script>'
+        )
+        page_title = title if index == 0 else f'{title}: {section_title or index + 1}'
+        parts.append((names[index], page_title, part_body))
+    return parts
+
+
+def paginate_document(html_filename: str, title: str, body: str, input_bytes: int,
+                      split_threshold: int = None) -> list:
+    """Pages for a document: one per section above split_threshold bytes of markdown, else one."""
+    if split_threshold and input_bytes > split_threshold:
+        return paginate_body(html_filename, title, body)
+    return [(html_filename, title, body)]
+
+
+def index_document_pages(html_filename: str, pages: list, anchor_index: dict, page_links: dict):
+    """
+    Record link data for a document's pages, given as (filename, anchors, hrefs).
 
-    # Ensure docs directory exists
-    DOCS_DIR.mkdir(exist_ok=True)
-    PDF_DIR.mkdir(exist_ok=True)
+    For a split document the first page also answers for every anchor in the
+    document, since its anchor map forwards deep links to the right part.
+    """
+    for filename, anchors, hrefs in pages:
+        anchor_index[filename] = anchors
+        page_links[filename] = hrefs
+    if len(pages) > 1:
+        anchor_index[html_filename] = set().union(*(anchors for _, anchors, _ in pages))
 
-    # Generate index page
-    print("Generating index.html...")
-    index_html = generate_index_page()
-    index_path = DOCS_DIR / 'index.html'
-    with open(index_path, 'w', encoding='utf-8') as f:
-        f.write(index_html)
-    print(f"  Created: {index_path}")
 
-    # Process each markdown file
+def build_fingerprint(options: dict) -> str:
+    """
+    Hash everything besides a document's own markdown that affects its pages:
+    this generator, the shared print styles, the build options and, for
+    reproducible builds, the stamped date.
+    """
+    digest = hashlib.sha256()
+    for path in (Path(__file__), Path(__file__).with_name('pdf_styles.py')):
+        digest.update(path.read_bytes())
+    if os.environ.get('SOURCE_DATE_EPOCH'):
+        digest.update(build_date().strftime('%B %d, %Y').encode('utf-8'))
+    digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_build_state(path: Path, fingerprint: str) -> dict:
+    """Load the incremental build state, or start empty if it was made by a different build."""
+    try:
+        state = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        state = None
+    if not state or state.get('fingerprint') != fingerprint:
+        return {'fingerprint': fingerprint, 'documents': {}}
+    return state
+
+
+def save_build_state(path: Path, state: dict, report: BuildReport):
+    """Write the incremental build state for the documents in this run's report."""
+    state['documents'] = {
+        name: document for name, document in sorted(state['documents'].items()) if name in report.documents
+    }
+    # Compact separators keep json on its C encoder; this runs on every no-op build
+    data = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    if path.exists() and path.read_bytes() == data:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def reuse_document(state: dict, html_filename: str, digest: str, docs_dir: Path, report: BuildReport,
+                   anchor_index: dict, page_links: dict) -> bool:
+    """
+    Skip a document whose markdown is unchanged since the last incremental build
+    and whose outputs still exist, restoring its report entry and link data.
+    """
+    previous = state['documents'].get(html_filename)
+    if not previous or previous['digest'] != digest:
+        return False
+    if not all((docs_dir / filename).exists() for filename in previous['files']):
+        return False
+    report.documents[html_filename] = previous['entry']
+    for filename, page in previous['pages'].items():
+        anchor_index[filename] = set(page['anchors'])
+        page_links[filename] = page['hrefs']
+    return True
+
+
+def remember_document(state: dict, html_filename: str, digest: str, files: list, pages: list,
+                      anchor_index: dict, page_links: dict, entry: dict):
+    """Record a freshly built document in the incremental build state."""
+    state['documents'][html_filename] = {
+        'digest': digest,
+        'files': files,
+        'pages': {
+            filename: {'anchors': sorted(anchor_index[filename]), 'hrefs': page_links[filename]}
+            for filename in pages
+        },
+        'entry': entry,
+    }
+
+
+def build_documents(report: BuildReport, anchor_index: dict, page_links: dict,
+                    variants: list = DEFAULT_VARIANTS, selected: set = None, split_threshold: int = None,
+                    state: dict = None, docs_dir: Path = DOCS_DIR, root_dir: Path = ROOT_DIR,
+                    documents: list = MD_FILES, parse=None, parse_cache: Path = None,
+                    highlight: str = DEFAULT_HIGHLIGHT, index=None) -> tuple:
+    """
+    Convert and write every document in MD_FILES, plus its output variants.
+    Each document is parsed once (with code highlighted per highlight) and
+    every page and variant renders from that intermediate, which is cached in
+    parse_cache if given.
+    With selected, only those output pages are built (one shard). Documents
+    with more than split_threshold bytes of markdown are paginated by section.
+    With an incremental build state, documents whose markdown is unchanged
+    are skipped (unless index, a corpus_index.CorpusIndex, lacks them).
+    Converted documents are added to index when one is given.
+    The output directory, document list and parser default
+    to this script's configuration; doc_builder.Builder passes its own.
+    Returns (success_count, error_count).
+    """
     success_count = 0
     error_count = 0
+    parse = parse or functools.partial(parse_markdown, highlight=highlight)
 
-    for md_file, title in MD_FILES:
-        md_path = ROOT_DIR / md_file
+    for md_file, title in documents:
+        md_path = root_dir / md_file
+        if selected is not None and md_file.replace('.md', '.html') not in selected:
+            continue
 
         if not md_path.exists():
             print(f"  Skipped: {md_file} (not found)")
             error_count += 1
             continue
 
+        # Generate output filename
+        html_filename = md_file.replace('.md', '.html')
+        entry = report.document(html_filename)
+
         try:
             # Read markdown content
-            with open(md_path, 'r', encoding='utf-8') as f:
-                md_content = f.read()
+            with stage_timer(entry, 'read'):
+                with open(md_path, 'r', encoding='utf-8') as f:
+                    md_content = f.read()
+            digest = hashlib.sha256(md_content.encode('utf-8')).hexdigest()
+            if (state is not None and (index is None or index.is_current(html_filename, digest))
+                    and reuse_document(state, html_filename, digest, docs_dir, report, anchor_index, page_links)):
+                print(f"  Unchanged: {html_filename}")
+                success_count += 1
+                continue
+
+            # Convert to HTML once, validating Mermaid blocks on the way
+            with stage_timer(entry, 'convert'):
+                fingerprint = converter_fingerprint(highlight) if parse_cache is not None else None
+                parsed = cached_parse(md_content, digest, html_filename, entry, parse_cache, parse, fingerprint)
+                body = parsed['body']
+                parts = paginate_document(html_filename, title, body, len(md_content.encode('utf-8')),
+                                          split_threshold)
+                pages = [
+                    (filename, render_page(page_title, page_body, root=page_root(filename), source=digest,
+                                           part=f'{number}/{len(parts)}'))
+                    for number, (filename, page_title, page_body) in enumerate(parts, 1)
+                ]
+            record_diagrams(entry, md_path, parsed['diagrams'])
+            if index is not None:
+                with stage_timer(entry, 'index'):
+                    index.update(html_filename, md_path.as_posix(), title, digest, md_content, parsed)
+
+            # Write HTML file (one per section for paginated documents)
+            with stage_timer(entry, 'write'):
+                for filename, html_content in pages:
+                    write_if_changed(docs_dir / filename, html_content, entry)
+
+            # Variants (the print variant for the PDF generator, themes) from the same parse
+            variant_files = write_variants(variants, docs_dir, html_filename, title, parsed, entry, source=digest)
+
+            with stage_timer(entry, 'links'):
+                index_document_pages(html_filename, [
+                    (filename, *collect_links(html_content)) for filename, html_content in pages
+                ], anchor_index, page_links)
+
+            entry['input_bytes'] = md_path.stat().st_size
+            entry['output_bytes'] = sum(len(html_content.encode('utf-8')) for _, html_content in pages)
+            entry['diagrams'], entry['code_blocks'] = count_blocks(body)
+            entry['elements'] = len(ELEMENT_PATTERN.findall(body))
+            if len(pages) > 1:
+                entry['parts'] = [filename for filename, _ in pages]
+            if state is not None:
+                files = [filename for filename, _ in pages] + variant_files
+                remember_document(state, html_filename, digest, files, [filename for filename, _ in pages],
+                                  anchor_index, page_links, entry)
+
+            print(f"  Created: {html_filename}")
+            success_count += 1
+
+        except Exception as e:
+            print(f"  Error processing {md_file}: {str(e)}")
+            error_count += 1
 
-            # Convert to HTML
-            html_content = convert_md_to_html(md_content, title)
+    return success_count, error_count
 
-            # Generate output filename
-            html_filename = md_file.replace('.md', '.html')
-            html_path = DOCS_DIR / html_filename
 
-            # Write HTML file
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+def record_diagrams(entry: dict, md_path: Path, diagrams: list):
+    """
+    Store per-diagram complexity and validation errors in a report entry.
+    """
+    entry['source'] = md_path.as_posix()
+    entry['mermaid'] = [
+        {'line': d['line'], 'type': d['type'], 'nodes': d['nodes'], 'edges': d['edges']}
+        for d in diagrams
+    ]
+    entry['mermaid_errors'] = [
+        {'line': line, 'message': message} for d in diagrams for line, message in d['errors']
+    ]
 
+
+def print_output_size(report: BuildReport, baseline: dict, highlight: str):
+    """
+    Print the pages' total size and body element count, with the change
+    against the baseline report for the documents it also has.
+    """
+    documents = {name: doc for name, doc in report.documents.items() if 'elements' in doc}
+    if not documents:
+        return
+    size = sum(doc['output_bytes'] for doc in documents.values())
+    elements = sum(doc['elements'] for doc in documents.values())
+    print(f"  Output ({highlight} highlighting): {size / 1024:,.0f} KB, {elements:,} elements")
+
+    previous = {
+        name: doc for name, doc in ((baseline or {}).get('documents') or {}).items()
+        if 'elements' in doc and name in documents
+    }
+    if not previous:
+        return
+    size_now = sum(documents[name]['output_bytes'] for name in previous)
+    size_before = sum(doc['output_bytes'] for doc in previous.values())
+    elements_now = sum(documents[name]['elements'] for name in previous)
+    elements_before = sum(doc['elements'] for doc in previous.values())
+    print(f"    baseline: {size_before / 1024:,.0f} KB, {elements_before:,} elements "
+          f"({(size_now - size_before) * 100 / (size_before or 1):+.1f}% size, "
+          f"{(elements_now - elements_before) * 100 / (elements_before or 1):+.1f}% elements)")
+
+
+def print_mermaid_report(report: BuildReport) -> int:
+    """
+    Print Mermaid validation errors as file:line messages; returns the error count.
+    """
+    errors = [
+        (doc['source'], error['line'], error['message'])
+        for doc in report.documents.values() for error in doc.get('mermaid_errors', [])
+    ]
+    if errors:
+        print(f"\n=== Mermaid Errors: {len(errors)} ===")
+        for source, line, message in errors:
+            print(f"  {source}:{line}: {message}")
+    return len(errors)
+
+
+def iter_documents(source_dir: Path = None):
+    """
+    Lazily yield (md_path, title, html_filename) for each document to build.
+
+    Without a source directory this walks MD_FILES. With one, markdown files
+    are discovered directory by directory as the build consumes them, and the
+    title is taken from MD_FILES or else the file's first level-1 heading.
+    """
+    if source_dir is None:
+        for md_file, title in MD_FILES:
+            yield ROOT_DIR / md_file, title, md_file.replace('.md', '.html')
+        return
+
+    known_titles = dict(MD_FILES)
+    pending = [source_dir]
+    while pending:
+        directory = pending.pop()
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.is_dir(follow_symlinks=False):
+                    if (not entry.name.startswith('.') and entry.name not in SKIP_DIRS
+                            and Path(entry.path).resolve() != DOCS_DIR.resolve()):
+                        pending.append(entry.path)
+                elif entry.name.endswith('.md') and entry.name != 'README.md':
+                    md_path = Path(entry.path)
+                    relative = md_path.relative_to(source_dir).as_posix()
+                    title = known_titles.get(relative) or read_title(md_path)
+                    yield md_path, title, relative[:-len('.md')] + '.html'
+
+
+def read_title(md_path: Path) -> str:
+    """
+    Read a document title from its first level-1 heading without loading the whole file.
+    """
+    with open(md_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = MD_TITLE_PATTERN.match(line)
+            if match:
+                return match.group(1)
+    return md_path.stem.replace('-', ' ').replace('_', ' ').title()
+
+
+def write_page_stream(html_path: Path, title: str, body: str, head_template: Template = PAGE_HEAD_TEMPLATE,
+                      tail_template: Template = PAGE_TAIL_TEMPLATE, css: str = CSS_STYLES,
+                      entry: dict = None, root: str = '', source: str = '', part: str = '1/1',
+                      nav: tuple = SITE_NAV) -> tuple:
+    """
+    Write a documentation page as a stream of parts instead of one large string.
+
+    The template is split around $content, so the page is written as head,
+    converted body and tail into a temporary file, which replaces the page
+    only if the bytes differ. Returns (anchors, hrefs, bytes written).
+    """
+    now = build_date()
+    fields = dict(title=title, css=css, date=now.strftime('%B %d, %Y'), year=now.year,
+                  diagram_cache_version=DIAGRAM_CACHE_VERSION, mermaid_version=MERMAID_VERSION,
+                  root=root, nav=render_nav(nav, root),
+                  source=source, part=part)
+    anchors = set()
+    hrefs = []
+    written = 0
+    html_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = html_path.with_name(html_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for part in (head_template.substitute(fields), body, tail_template.substitute(fields)):
+            f.write(part)
+            part_anchors, part_hrefs = collect_links(part)
+            anchors |= part_anchors
+            hrefs.extend(part_hrefs)
+            written += len(part.encode('utf-8'))
+    replace_if_changed(tmp_path, html_path, entry)
+    return anchors, hrefs, written
+
+
+def stream_build(report: BuildReport, anchor_index: dict, page_links: dict,
+                 source_dir: Path = None, variants: list = DEFAULT_VARIANTS, selected: set = None,
+                 split_threshold: int = None, state: dict = None, parse_cache: Path = None,
+                 highlight: str = DEFAULT_HIGHLIGHT, index=None) -> tuple:
+    """
+    Build documents one at a time with bounded memory.
+
+    Each document is read, converted with a single reused Markdown instance
+    (or loaded from parse_cache), written out with its variants as a stream of
+    page parts and released before the next one is read. Only link data and
+    report entries are kept per document.
+    Documents above split_threshold bytes of markdown are paginated by section,
+    and with an incremental build state unchanged documents are skipped.
+    Converted documents are added to the corpus index if one is given.
+    Pages from a source_dir link only to the docs index, not to SITE_NAV.
+    Returns (success_count, error_count).
+    """
+    md = None
+    success_count = 0
+    error_count = 0
+    start = time.perf_counter()
+    nav = SITE_NAV if source_dir is None else CORPUS_NAV
+
+    def parse(md_content):
+        nonlocal md
+        md = md or create_markdown(highlight)
+        return parse_markdown(md_content, md)
+
+    for md_path, title, html_filename in iter_documents(source_dir):
+        if selected is not None and html_filename not in selected:
+            continue
+        entry = report.document(html_filename)
+        try:
+            with stage_timer(entry, 'read'):
+                with open(md_path, 'r', encoding='utf-8') as f:
+                    md_content = f.read()
+            entry['input_bytes'] = len(md_content.encode('utf-8'))
+            digest = hashlib.sha256(md_content.encode('utf-8')).hexdigest()
+            if (state is not None and (index is None or index.is_current(html_filename, digest))
+                    and reuse_document(state, html_filename, digest, DOCS_DIR, report, anchor_index, page_links)):
+                print(f"  Unchanged: {html_filename}")
+                success_count += 1
+                continue
+
+            with stage_timer(entry, 'convert'):
+                fingerprint = converter_fingerprint(highlight) if parse_cache is not None else None
+                parsed = cached_parse(md_content, digest, html_filename, entry, parse_cache, parse, fingerprint)
+                body = parsed['body']
+            if index is not None:
+                with stage_timer(entry, 'index'):
+                    index.update(html_filename, md_path.as_posix(), title, digest, md_content, parsed)
+            del md_content
+            record_diagrams(entry, md_path, parsed['diagrams'])
+
+            with stage_timer(entry, 'write'):
+                pages = []
+                entry['output_bytes'] = 0
+                parts = paginate_document(html_filename, title, body, entry['input_bytes'], split_threshold)
+                for number, (filename, page_title, page_body) in enumerate(parts, 1):
+                    anchors, hrefs, written = write_page_stream(DOCS_DIR / filename, page_title, page_body,
+                                                                entry=entry, root=page_root(filename),
+                                                                source=digest, part=f'{number}/{len(parts)}',
+                                                                nav=nav)
+                    pages.append((filename, anchors, sorted(set(hrefs))))
+                    entry['output_bytes'] += written
+            variant_files = write_variants(variants, DOCS_DIR, html_filename, title, parsed, entry, stream=True,
+                                           source=digest, nav=nav)
+            entry['diagrams'], entry['code_blocks'] = count_blocks(body)
+            entry['elements'] = len(ELEMENT_PATTERN.findall(body))
+            del body, parsed
+
+            index_document_pages(html_filename, pages, anchor_index, page_links)
+            if len(pages) > 1:
+                entry['parts'] = [filename for filename, _, _ in pages]
+            if state is not None:
+                files = [filename for filename, _, _ in pages] + variant_files
+                remember_document(state, html_filename, digest, files, [filename for filename, _, _ in pages],
+                                  anchor_index, page_links, entry)
             print(f"  Created: {html_filename}")
             success_count += 1
 
+        except FileNotFoundError:
+            print(f"  Skipped: {md_path} (not found)")
+            error_count += 1
         except Exception as e:
-            print(f"  Error processing {md_file}: {str(e)}")
+            print(f"  Error processing {md_path}: {str(e)}")
             error_count += 1
 
+    elapsed = time.perf_counter() - start
+    rate = success_count / elapsed if elapsed else 0.0
+    # ru_maxrss is in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\n  Streamed {success_count} documents in {elapsed:.2f}s "
+          f"({rate:.1f} documents/s, peak RSS {peak_mb:.0f} MB)")
+    return success_count, error_count
+
+
+def collect_links(html: str) -> tuple:
+    """
+    Collect anchor IDs and hrefs from a generated page in a single pass.
+
+    Heading IDs assigned by the toc extension are plain id attributes, so they
+    are picked up here together with any other element IDs on the page.
+    """
+    anchors = set()
+    hrefs = []
+    for match in LINK_ATTR_PATTERN.finditer(html):
+        if match.group(1) == 'id':
+            anchors.add(match.group(2))
+        else:
+            hrefs.append(match.group(2))
+    return anchors, hrefs
+
+
+def validate_links(anchor_index: dict, page_links: dict) -> list:
+    """
+    Validate every href against the global anchor index.
+
+    anchor_index maps each generated page (relative to DOCS_DIR) to its set of
+    IDs, page_links maps each page to the hrefs found on it. Links to other
+    assets (PDFs, images) and external URLs are not checked here.
+    Returns a list of (page, href, reason) tuples, one per broken link.
+    """
+    broken = []
+    for page, hrefs in page_links.items():
+        for href in hrefs:
+            if not href or EXTERNAL_LINK_PATTERN.match(href):
+                continue
+            path, _, fragment = href.partition('#')
+            path = path.partition('?')[0]
+            if path:
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(page), path))
+            else:
+                target = page
+            if not target.endswith('.html'):
+                continue
+            if target not in anchor_index:
+                broken.append((page, href, 'page not found'))
+            elif fragment and unquote(fragment) not in anchor_index[target]:
+                broken.append((page, href, 'anchor not found'))
+    return broken
+
+
+def print_link_report(broken: list):
+    """
+    Print broken links grouped by the page they appear on.
+    """
+    print(f"\n=== Broken Links: {len(broken)} ===")
+    current_page = None
+    for page, href, reason in broken:
+        if page != current_page:
+            print(f"  {page}:")
+            current_page = page
+        print(f"    {href} ({reason})")
+
+
+def shard_documents(args) -> set:
+    """
+    Pick this run's documents for --shard i/N, balanced by the costs in the previous report.
+    """
+    sizes = {
+        html_filename: md_path.stat().st_size
+        for md_path, _, html_filename in iter_documents(args.source_dir)
+        if md_path.exists()
+    }
+    return select_shard(args.shard, sizes, load_report(args.baseline or args.report))
+
+
+def write_shard_manifest(args, report: BuildReport, anchor_index: dict, page_links: dict,
+                         variants: list):
+    """
+    Record the pages this shard wrote, with their anchor data, for the merge step.
+    """
+    documents = {}
+    for html_filename in anchor_index:
+        files = [html_filename]
+        if html_filename in report.documents:
+            files += [f'{OUTPUT_VARIANTS[name].directory}/{html_filename}' for name in variants]
+        documents[html_filename] = {
+            'files': files,
+            'anchors': sorted(anchor_index[html_filename]),
+            'hrefs': page_links[html_filename],
+        }
+    report.finish()
+    path = manifest_path(DOCS_DIR, 'html', args.shard)
+    write_manifest(path, 'html', args.shard, documents, report.to_dict())
+    print(f"  Shard manifest: {path}")
+
+
+def merged_report(generator: str, manifests: list) -> BuildReport:
+    """
+    Combine shard reports; the total time is the slowest shard, since shards run in parallel.
+    """
+    report = BuildReport(generator)
+    shard_reports = [manifest['report'] for _, manifest in manifests if manifest['generator'] == generator]
+    for shard_report in shard_reports:
+        report.documents.update(shard_report['documents'])
+    report.total_seconds = max((r['total_seconds'] or 0 for r in shard_reports), default=0)
+    return report
+
+
+def merge_shards(args) -> int:
+    """
+    Assemble shard outputs into DOCS_DIR.
+
+    Verifies that every expected page (and PDF, when PDF shards are present)
+    was built by exactly one shard, copies the shard files in, then builds
+    index.html, validates links from the shards' anchor data and writes the
+    merged build reports, which also become the costs for the next sharded run.
+    """
+    print("\n=== Merging Documentation Shards ===\n")
+    manifests = load_manifests(args.merge)
+
+    from generate_pdfs_enhanced import HTML_FILES
+
+    expected_html = [md_file.replace('.md', '.html') for md_file, _ in MD_FILES if (ROOT_DIR / md_file).exists()]
+    problems = verify_manifests(manifests, 'html', expected_html)
+    has_pdf_shards = any(manifest['generator'] == 'pdf' for _, manifest in manifests)
+    if has_pdf_shards:
+        expected_pdf = [html_file.replace('.html', '.pdf') for html_file in HTML_FILES]
+        problems += verify_manifests(manifests, 'pdf', expected_pdf)
+    if problems:
+        print(f"=== Merge Problems: {len(problems)} ===")
+        for problem in problems:
+            print(f"  {problem}")
+        return 1
+
+    anchor_index = {}
+    page_links = {}
+    copied = 0
+    for shard_dir, manifest in manifests:
+        for name, document in manifest['documents'].items():
+            for relative in document['files']:
+                source = shard_dir / relative
+                target = DOCS_DIR / relative
+                if target.exists() and filecmp.cmp(source, target, shallow=False):
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(source, target)
+                copied += 1
+            if manifest['generator'] == 'html':
+                anchor_index[name] = set(document['anchors'])
+                page_links[name] = document['hrefs']
+    print(f"  Copied {copied} changed files from {len(manifests)} shards")
+
+    index_html = generate_index_page()
+    write_if_changed(DOCS_DIR / 'index.html', index_html)
+    anchor_index['index.html'], page_links['index.html'] = collect_links(index_html)
+    print(f"  Created: {DOCS_DIR / 'index.html'}")
+
+    exit_code = 0
+    broken = validate_links(anchor_index, page_links)
+    if broken:
+        print_link_report(broken)
+        if not args.allow_broken_links:
+            exit_code = 1
+    else:
+        print("  Links: all internal links resolve")
+
+    html_report = merged_report('html', manifests)
+    html_report.document('index.html')['output_bytes'] = len(index_html.encode('utf-8'))
+    write_offline_support(DOCS_DIR, html_report)
+    exit_code = finish_report(html_report, args) or exit_code
+    if has_pdf_shards:
+        pdf_args = argparse.Namespace(**vars(args))
+        pdf_args.report = args.report.with_name('pdf-report.json')
+        pdf_args.baseline = None
+        exit_code = finish_report(merged_report('pdf', manifests), pdf_args) or exit_code
+    return exit_code
+
+
+def snapshot_outputs(docs_dir: Path = DOCS_DIR) -> dict:
+    """Hash every generated output under docs_dir (PDFs are not covered)."""
+    pdf_dir = docs_dir / PDF_DIR.relative_to(DOCS_DIR)
+    return {
+        path.relative_to(docs_dir).as_posix(): hashlib.sha256(path.read_bytes()).hexdigest()
+        for path in sorted(docs_dir.rglob('*'))
+        if path.is_file() and pdf_dir not in path.parents
+    }
+
+
+def mirror_sources(target: Path):
+    """
+    Mirror the working directory into target as symlinks to its files,
+    leaving out DOCS_DIR and hidden directories such as .doc-cache, so a
+    build run in target starts without outputs or caches.
+    """
+    for directory, dirnames, filenames in os.walk('.'):
+        dirnames[:] = [
+            name for name in dirnames
+            if not name.startswith('.') and name not in SKIP_DIRS
+            and Path(directory, name).resolve() != DOCS_DIR.resolve()
+        ]
+        (target / directory).mkdir(parents=True, exist_ok=True)
+        for name in filenames:
+            os.symlink(Path(directory, name).resolve(), target / directory / name)
+
+
+def self_check(argv: list) -> int:
+    """
+    Build twice in reproducible mode and compare the outputs byte for byte.
+
+    Each build runs in its own interpreter with a different hash seed, so
+    output that depends on set or dict ordering shows up as a difference too,
+    and in its own temporary copy of the sources, so neither build reuses the
+    other's pages or caches and the live DOCS_DIR is left alone. --incremental
+    is dropped for the same reason. Returns 1 if any output differs.
+    """
+    print("\n=== Reproducibility Self-Check ===\n")
+    argv = [arg for arg in argv if arg not in ('--self-check', '--incremental')]
+    env = dict(os.environ)
+    if not env.get('SOURCE_DATE_EPOCH'):
+        # Resolved here: the builds run outside the git checkout
+        try:
+            env['SOURCE_DATE_EPOCH'] = git_commit_time()
+        except (OSError, subprocess.CalledProcessError):
+            print("Error: --self-check needs SOURCE_DATE_EPOCH or a git checkout")
+            return 2
+    snapshots = []
+    for seed in ('1', '2'):
+        with tempfile.TemporaryDirectory(prefix='doc-self-check-') as tmp_dir:
+            mirror_sources(Path(tmp_dir))
+            result = subprocess.run([sys.executable, str(Path(__file__).resolve()), *argv, '--reproducible'],
+                                    env=dict(env, PYTHONHASHSEED=seed), cwd=tmp_dir, stdout=subprocess.DEVNULL)
+            if result.returncode not in (0, 1):
+                print(f"  Build {len(snapshots) + 1} failed with exit code {result.returncode}")
+                return result.returncode
+            snapshots.append(snapshot_outputs(Path(tmp_dir) / DOCS_DIR))
+
+    first, second = snapshots
+    differing = sorted(name for name in first.keys() | second.keys() if first.get(name) != second.get(name))
+    if differing:
+        print(f"  Not reproducible: {len(differing)} of {len(second)} outputs differ")
+        for name in differing:
+            print(f"    {name}")
+        return 1
+    print(f"  Reproducible: {len(second)} outputs byte-identical across two builds")
+    return 0
+
+
+def parse_args(argv=None):
+    """
+    Parse command line options.
+    """
+    parser = argparse.ArgumentParser(description='Generate Securaa HTML documentation.')
+    parser.add_argument('--allow-broken-links', action='store_true',
+                        help='report broken internal links without failing the build')
+    parser.add_argument('--strict-mermaid', action='store_true',
+                        help='fail the build when a Mermaid diagram does not validate')
+    parser.add_argument('--no-print-variant', action='store_true',
+                        help=f'do not write print variants (PDF_CSS baked in) to {PRINT_DIR}')
+    parser.add_argument('--variant', action='append', default=[], choices=sorted(OUTPUT_VARIANTS),
+                        help='also write this output variant to docs/<variant>/ (repeatable)')
+    parser.add_argument('--highlight', choices=HIGHLIGHT_MODES, default=DEFAULT_HIGHLIGHT,
+                        help='code highlighting: full Pygments markup, compact (merged tokens, '
+                             'unwrapped whitespace) or lazy (highlighted in the browser on scroll)')
+    parser.add_argument('--stream', action='store_true',
+                        help='bounded-memory build: discover, convert and write one document at a time')
+    parser.add_argument('--source-dir', type=Path, default=None,
+                        help='with --stream, build every markdown file found under this directory '
+                             'instead of MD_FILES')
+    parser.add_argument('--split-threshold', type=int, default=None, metavar='KB',
+                        help='split documents with more than KB of markdown into one page per section')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'skip documents whose markdown is unchanged since the last incremental build '
+                             f'(state in {BUILD_STATE_PATH})')
+    parser.add_argument('--no-index', action='store_true',
+                        help=f'do not update the corpus index ({CORPUS_INDEX_PATH}, see corpus_index.py)')
+    parser.add_argument('--reproducible', action='store_true',
+                        help='stamp pages with SOURCE_DATE_EPOCH or the HEAD commit time instead of now')
+    parser.add_argument('--self-check', action='store_true',
+                        help='build twice in reproducible mode and report any output that differs')
+    parser.add_argument('--shard', metavar='i/N',
+                        help='build only shard i of N, balanced by the costs in the previous report')
+    parser.add_argument('--merge', nargs='+', type=Path, metavar='DIR',
+                        help='assemble the outputs of sharded HTML and PDF builds from these directories')
+    add_report_arguments(parser, REPORT_DIR / 'html-report.json')
+    return parser.parse_args(argv)
+
+
+def write_index_page(index_html: str, report: BuildReport, anchor_index: dict, page_links: dict):
+    """Write docs/index.html and record its links and size."""
+    print("Generating index.html...")
+    index_path = DOCS_DIR / 'index.html'
+    write_if_changed(index_path, index_html, report.document('index.html'))
+    print(f"  Created: {index_path}")
+    anchor_index['index.html'], page_links['index.html'] = collect_links(index_html)
+    report.document('index.html')['output_bytes'] = len(index_html.encode('utf-8'))
+
+
+def main(argv=None) -> int:
+    """
+    Main function to generate all HTML documentation.
+    """
+    args = parse_args(argv)
+    if args.source_dir and not args.stream:
+        print("Error: --source-dir requires --stream")
+        return 2
+    if args.split_threshold and args.no_print_variant:
+        print("Error: --split-threshold needs print variants, which the PDF generator renders whole")
+        return 2
+    if args.self_check:
+        return self_check(argv if argv is not None else sys.argv[1:])
+    if args.reproducible and not os.environ.get('SOURCE_DATE_EPOCH'):
+        try:
+            os.environ['SOURCE_DATE_EPOCH'] = git_commit_time()
+        except (OSError, subprocess.CalledProcessError):
+            print("Error: --reproducible needs SOURCE_DATE_EPOCH or a git checkout")
+            return 2
+    if args.merge:
+        return merge_shards(args)
+    selected = None
+    if args.shard:
+        try:
+            selected = shard_documents(args)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 2
+    report = BuildReport('html')
+
+    print("\n=== Securaa Documentation Generator ===\n")
+
+    # Ensure docs directory exists
+    DOCS_DIR.mkdir(exist_ok=True)
+    PDF_DIR.mkdir(exist_ok=True)
+
+    # Global anchor index and per-page hrefs, filled as each page is written
+    anchor_index = {}
+    page_links = {}
+
+    # Generate index page (built by the merge step for sharded builds, and
+    # after the documents for --source-dir, since it lists what was found)
+    if args.shard:
+        print(f"Building shard {args.shard}: {len(selected)} documents")
+    elif not args.source_dir:
+        write_index_page(generate_index_page(), report, anchor_index, page_links)
+
+    # Process each markdown file
+    variants = [] if args.no_print_variant else list(DEFAULT_VARIANTS)
+    variants += [name for name in args.variant if name not in variants]
+    split_threshold = args.split_threshold * 1024 if args.split_threshold else None
+    state = None
+    parse_cache = None
+    if args.incremental:
+        state = load_build_state(BUILD_STATE_PATH, build_fingerprint({
+            'variants': variants,
+            'highlight': args.highlight,
+            'split_threshold': split_threshold,
+            'source_dir': args.source_dir and str(args.source_dir),
+        }))
+        parse_cache = PARSE_CACHE_DIR
+    index = None
+    if not args.no_index:
+        from corpus_index import CorpusIndex
+        index = CorpusIndex(CORPUS_INDEX_PATH, functools.partial(converter_fingerprint, args.highlight))
+    if args.stream:
+        success_count, error_count = stream_build(report, anchor_index, page_links, args.source_dir,
+                                                  variants, selected, split_threshold, state, parse_cache,
+                                                  args.highlight, index)
+    else:
+        success_count, error_count = build_documents(report, anchor_index, page_links, variants,
+                                                     selected, split_threshold, state, parse_cache=parse_cache,
+                                                     highlight=args.highlight, index=index)
+    if args.source_dir and not args.shard:
+        write_index_page(generate_index_page([
+            (html_filename, title) for _, title, html_filename in iter_documents(args.source_dir)
+            if html_filename in anchor_index
+        ]), report, anchor_index, page_links)
+    if state is not None:
+        save_build_state(BUILD_STATE_PATH, state, report)
+    if index is not None:
+        # A shard indexes only its own documents, so only full builds drop removed ones
+        if selected is None:
+            index.prune(report.documents)
+        index.close()
+    # Sharded builds get theirs from the merge step, which has all the pages
+    if not args.shard:
+        write_offline_support(DOCS_DIR, report)
+
     print(f"\n=== Generation Complete ===")
     print(f"  Successful: {success_count}")
     print(f"  Errors: {error_count}")
+    print(f"  Unchanged files: {sum(doc.get('unchanged_files', 0) for doc in report.documents.values())}")
+    print_output_size(report, load_report(args.baseline or args.report), args.highlight)
     print(f"  Output directory: {DOCS_DIR.absolute()}")
 
+    # Invalid diagrams were already replaced by their source; optionally fail on them
+    exit_code = 0
+    if print_mermaid_report(report) and args.strict_mermaid:
+        exit_code = 1
+
+    # Shards only record their anchor data; links and regressions are checked on merge
+    if args.shard:
+        write_shard_manifest(args, report, anchor_index, page_links, variants)
+        return exit_code or (1 if error_count else 0)
+
+    # Validate internal links against the anchor index
+    broken = validate_links(anchor_index, page_links)
+    if broken:
+        print_link_report(broken)
+        if not args.allow_broken_links:
+            exit_code = 1
+    else:
+        print("  Links: all internal links resolve")
+
+    return finish_report(report, args) or exit_code
+
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
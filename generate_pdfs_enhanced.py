@@ -4,15 +4,67 @@ Securaa Enhanced PDF Generator
 Generates high-quality PDFs from HTML documentation with properly sized diagrams.
 """
 
+import argparse
 import asyncio
+import base64
+import hashlib
+import html as html_lib
+import importlib.util
+import json
 import os
+import re
+import sys
+import tempfile
+from contextlib import asynccontextmanager
 from pathlib import Path
-from playwright.async_api import async_playwright
+from string import Template
+
+from build_report import (REPORT_DIR, BuildReport, add_report_arguments, count_blocks, finish_report,
+                          load_report, stage_timer)
+from pdf_styles import PDF_CSS
+from sharding import manifest_path, select_shard, write_manifest
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # only needed for --chunked
+    PdfReader = PdfWriter = None
 
 
 # Configuration
 DOCS_DIR = Path('docs')
 PDF_DIR = DOCS_DIR / 'pdf'
+CACHE_DIR = Path('.doc-cache')
+CHUNK_CACHE_DIR = CACHE_DIR / 'pdf-chunks'
+CHECKPOINT_PATH = CACHE_DIR / 'pdf-checkpoint.json'   # documents finished so far, for --resume
+PRINT_DIR = DOCS_DIR / 'print'   # print variants written by generate_documentation.py
+DAEMON_STATE_FILE = CACHE_DIR / 'render-daemon.json'   # written by render_daemon.py
+DAEMON_CONNECT_TIMEOUT = 2000                           # ms before falling back to a launch
+PAGE_META_PATTERN = re.compile(r'<meta name="(source-digest|document-part)" content="([^"]*)">')
+
+# Concurrency and memory limits for browser rendering
+PAGE_MEMORY_ESTIMATE = 600 * 1024 * 1024   # RSS of one large diagram-heavy page
+MEMORY_BUDGET_FRACTION = 0.75              # share of the memory limit the browser may use
+MEMORY_HIGH_WATERMARK = 0.85               # above this share of the budget: back off and recycle
+MEMORY_LOW_WATERMARK = 0.60                # below this share of the budget: allow one more page
+MEMORY_SAMPLE_INTERVAL = 0.5               # seconds between process-tree RSS samples
+DOCS_PER_CONTEXT = 8                       # recycle the browser context after this many documents
+
+# Performance tracing: Performance.getMetrics values recorded per pipeline stage.
+# Counters and durations are cumulative, so each stage records its delta;
+# JSHeapUsedSize is a level, so each stage records its peak
+TRACE_METRICS = (
+    'LayoutCount', 'LayoutDuration', 'RecalcStyleCount', 'RecalcStyleDuration',
+    'ScriptDuration', 'TaskDuration', 'JSHeapUsedSize',
+)
+TRACE_LEVEL_METRICS = {'JSHeapUsedSize'}
+TRACE_CATEGORIES = [
+    'devtools.timeline', 'disabled-by-default-devtools.timeline',
+    'disabled-by-default-devtools.timeline.frame', 'v8.execute', 'blink.user_timing', 'loading', 'toplevel',
+]
+TRACE_SUMMARY_ROWS = 5
+
+# Per-diagram render budget in ms set on every page (None keeps the page default)
+MERMAID_RENDER_BUDGET = None
 
 # HTML files to convert to PDF
 HTML_FILES = [
@@ -41,296 +93,270 @@ HTML_FILES = [
     'securaa-information-security-risk-assesment-process.html',
 ]
 
-# Enhanced CSS for PDF rendering - with LARGER diagrams
-PDF_CSS = """
-/* PDF-specific styles for better diagram rendering */
-@page {
-    size: A4;
-    margin: 12mm 10mm 15mm 10mm;
-}
-
-/* General text styling for better PDF readability */
-body {
-    font-family: 'Helvetica Neue', Arial, sans-serif !important;
-    font-size: 10pt !important;
-    line-height: 1.5 !important;
-    color: #1a1a1a !important;
-    background: white !important;
-}
-
-/* Hide navigation and footer for PDF */
-.main-header,
-.documentation-nav,
-.footer {
-    display: none !important;
-}
-
-/* Main content area - use full width */
-.main-content {
-    max-width: 100% !important;
-    margin: 0 !important;
-    padding: 0 !important;
-    box-shadow: none !important;
-    border-radius: 0 !important;
-}
-
-/* Typography for PDF */
-h1 {
-    font-size: 20pt !important;
-    color: #1a365d !important;
-    -webkit-text-fill-color: #1a365d !important;
-    background: none !important;
-    border-bottom: 2px solid #3182ce !important;
-    padding-bottom: 6pt !important;
-    margin-top: 0 !important;
-    margin-bottom: 12pt !important;
-    page-break-after: avoid !important;
-}
-
-h2 {
-    font-size: 14pt !important;
-    color: #2c5282 !important;
-    border-bottom: 1px solid #cbd5e0 !important;
-    padding-bottom: 4pt !important;
-    margin-top: 16pt !important;
-    margin-bottom: 8pt !important;
-    page-break-after: avoid !important;
-}
-
-h3 {
-    font-size: 12pt !important;
-    color: #2d3748 !important;
-    margin-top: 12pt !important;
-    margin-bottom: 6pt !important;
-    page-break-after: avoid !important;
-}
-
-h4 {
-    font-size: 11pt !important;
-    color: #4a5568 !important;
-    margin-top: 10pt !important;
-    margin-bottom: 4pt !important;
-    page-break-after: avoid !important;
-}
-
-h5, h6 {
-    font-size: 10pt !important;
-    color: #4a5568 !important;
-    page-break-after: avoid !important;
-}
-
-p {
-    margin-bottom: 6pt !important;
-    text-align: justify !important;
-    orphans: 3 !important;
-    widows: 3 !important;
-}
-
-/* Lists */
-ul, ol {
-    margin-bottom: 6pt !important;
-    padding-left: 18pt !important;
-}
-
-li {
-    margin-bottom: 3pt !important;
-}
-
-/* Code blocks */
-pre {
-    background: #f7fafc !important;
-    color: #2d3748 !important;
-    border: 1px solid #e2e8f0 !important;
-    border-radius: 4pt !important;
-    padding: 8pt !important;
-    font-size: 7pt !important;
-    line-height: 1.3 !important;
-    overflow-x: visible !important;
-    white-space: pre-wrap !important;
-    word-wrap: break-word !important;
-    page-break-inside: avoid !important;
-    margin: 8pt 0 !important;
-}
-
-code {
-    font-family: 'Consolas', 'Monaco', monospace !important;
-    font-size: 7pt !important;
-}
-
-:not(pre) > code {
-    background: #edf2f7 !important;
-    color: #2d3748 !important;
-    padding: 1pt 3pt !important;
-    border-radius: 2pt !important;
-}
-
-/* Tables */
-table {
-    width: 100% !important;
-    border-collapse: collapse !important;
-    margin: 8pt 0 !important;
-    font-size: 8pt !important;
-    page-break-inside: avoid !important;
-}
-
-thead {
-    background: #2c5282 !important;
-}
-
-th {
-    color: white !important;
-    padding: 6pt !important;
-    text-align: left !important;
-    font-weight: 600 !important;
-    font-size: 7pt !important;
-}
-
-td {
-    padding: 5pt 6pt !important;
-    border: 1px solid #e2e8f0 !important;
-}
-
-tr:nth-child(even) {
-    background: #f7fafc !important;
-}
-
-/* Blockquotes */
-blockquote {
-    border-left: 3pt solid #3182ce !important;
-    padding-left: 10pt !important;
-    margin: 8pt 0 !important;
-    background: #ebf8ff !important;
-    padding: 8pt !important;
-    border-radius: 0 4pt 4pt 0 !important;
-    page-break-inside: avoid !important;
-}
-
-/* Links */
-a {
-    color: #2b6cb0 !important;
-    text-decoration: none !important;
-}
-
-/* Horizontal rules */
-hr {
-    border: none !important;
-    border-top: 1px solid #e2e8f0 !important;
-    margin: 12pt 0 !important;
-}
-
-/* MERMAID DIAGRAMS - LARGE and readable */
-.mermaid {
-    display: block !important;
-    width: 100% !important;
-    margin: 12pt 0 !important;
-    padding: 8pt !important;
-    background: #ffffff !important;
-    border: 1px solid #e2e8f0 !important;
-    border-radius: 4pt !important;
-    page-break-inside: avoid !important;
-    overflow: visible !important;
-    text-align: center !important;
-}
-
-/* SVG should take full width */
-.mermaid svg {
-    display: block !important;
-    margin: 0 auto !important;
-    width: 100% !important;
-    max-width: none !important;
-    height: auto !important;
-    min-height: 100px !important;
-}
-
-/* Ensure diagram labels are readable - LARGER font */
-.mermaid text,
-.mermaid .nodeLabel,
-.mermaid .label,
-.mermaid .edgeLabel,
-.mermaid .cluster-label,
-.mermaid tspan {
-    font-family: 'Helvetica Neue', Arial, sans-serif !important;
-    font-size: 10pt !important;
-    fill: #1a202c !important;
-}
-
-/* Node styling for better visibility */
-.mermaid .node rect,
-.mermaid .node circle,
-.mermaid .node polygon,
-.mermaid .node ellipse {
-    stroke: #2d3748 !important;
-    stroke-width: 1.5px !important;
-}
-
-/* Edge/line styling - thicker lines */
-.mermaid .edgePath path,
-.mermaid .flowchart-link {
-    stroke: #2d3748 !important;
-    stroke-width: 2px !important;
-}
-
-/* Arrow styling */
-.mermaid marker path {
-    fill: #2d3748 !important;
-}
-
-/* Cluster/subgraph styling */
-.mermaid .cluster rect {
-    fill: #f0f4f8 !important;
-    stroke: #718096 !important;
-    stroke-width: 1.5px !important;
-}
-
-/* Sequence diagram specific */
-.mermaid .actor {
-    stroke: #2d3748 !important;
-    fill: #e2e8f0 !important;
-}
-
-.mermaid .actor-line {
-    stroke: #718096 !important;
-    stroke-width: 1px !important;
-}
-
-.mermaid .messageLine0,
-.mermaid .messageLine1 {
-    stroke: #2d3748 !important;
-    stroke-width: 1.5px !important;
-}
-
-/* ER diagram specific */
-.mermaid .er.entityBox {
-    fill: #e2e8f0 !important;
-    stroke: #2d3748 !important;
-}
-
-/* Class diagram specific */
-.mermaid .classGroup rect {
-    fill: #e2e8f0 !important;
-    stroke: #2d3748 !important;
+# Viewport for print variants: the A4 content width (210mm - 20mm margins at 96 dpi),
+# so diagrams lay out at the width they are printed at
+PRINT_VIEWPORT = {'width': 718, 'height': 1040}
+
+# Printable height of an A4 page (297mm - 27mm margins at 96 dpi). Code blocks
+# and tables up to KEEP_TOGETHER_FRACTION of it stay on one page; longer ones
+# are split into pieces of at most SPLIT_CHUNK_FRACTION of it
+PRINT_PAGE_HEIGHT = 1020
+KEEP_TOGETHER_FRACTION = 0.5
+SPLIT_CHUNK_FRACTION = 0.4
+
+# Page layout shared by full and chunked rendering
+PDF_MARGIN = {
+    'top': '12mm',
+    'right': '10mm',
+    'bottom': '15mm',
+    'left': '10mm'
 }
 
-/* Flowchart specific - node colors */
-.mermaid .node.default > rect,
-.mermaid .node.default > polygon {
-    fill: #e2e8f0 !important;
+PDF_HEADER_TEMPLATE = '''
+    <div style="font-size: 8pt; color: #718096; width: 100%; text-align: center; padding: 5px 10mm;">
+        Securaa Platform Documentation
+    </div>
+'''
+
+PDF_FOOTER_TEMPLATE = '''
+    <div style="font-size: 8pt; color: #718096; width: 100%; padding: 5px 10mm; display: flex; justify-content: space-between;">
+        <span>Confidential</span>
+        <span>Page <span class="pageNumber"></span> of <span class="totalPages"></span></span>
+    </div>
+'''
+
+# Page.printToPDF takes inches; paper sizes and CSS units (in px) as page.pdf() converts them
+PAPER_SIZES = {'A4': (8.27, 11.7)}
+CSS_UNIT_PIXELS = {'px': 1, 'in': 96, 'cm': 37.8, 'mm': 3.78}
+CSS_LENGTH_PATTERN = re.compile(r'^([\d.]+)(px|in|cm|mm)$')
+
+# Bytes requested per IO.read when streaming a PDF or trace from Chromium to disk
+STREAM_READ_SIZE = 1 << 20
+
+# Browser-free backend (WeasyPrint): PDF_CSS already sets the A4 page and margins,
+# this adds the header and footer that Chromium draws from the templates above
+WEASYPRINT_PAGE_CSS = '''
+@page {
+    @top-center { content: "Securaa Platform Documentation"; font-size: 8pt; color: #718096; }
+    @bottom-left { content: "Confidential"; font-size: 8pt; color: #718096; }
+    @bottom-right { content: "Page " counter(page) " of " counter(pages); font-size: 8pt; color: #718096; }
 }
+'''
+# A diagram is pre-rendered when its div already holds the SVG
+MERMAID_DIV_PATTERN = re.compile(r'<div class="mermaid"[^>]*>\s*(<svg)?')
+
+# Chunked rendering: top-level sections start at each <h2> inside <main>
+MAIN_OPEN_PATTERN = re.compile(r'<main class="main-content">')
+SECTION_SPLIT_PATTERN = re.compile(r'(?=<h2[\s>])')
+SECTION_TITLE_PATTERN = re.compile(r'<h[12][^>]*>(.*?)</h[12]>', re.S)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+PDF_PAGE_PATTERN = re.compile(rb'/Type\s*/Page(?![s\w])')
+
+# Blank pages carrying only the header and footer, stamped over merged chunks
+OVERLAY_HTML = Template("""<!DOCTYPE html>
+<html><head><style>
+html, body { margin: 0; background: transparent; }
+.sheet { break-after: page; }
+.sheet:last-child { break-after: auto; }
+</style></head><body>$sheets</body></html>
+""")
+
+
+# Pagination stage: measures code blocks and tables at print width, keeps short
+# ones whole and splits long ones at row or line boundaries. Table pieces repeat
+# the header; code pieces prefer to end at a blank line
+PAGINATE_BLOCKS_SCRIPT = """
+({pageHeight, keepFraction, chunkFraction, smart}) => {
+    const stats = {kept: 0, tables: 0, code: 0, pieces: 0};
+    const keepHeight = pageHeight * keepFraction;
+    const chunkHeight = pageHeight * chunkFraction;
+    const blocks = Array.from(document.querySelectorAll('pre, table'))
+        .filter(block => !block.closest('.mermaid, td, th'));
+
+    const markPieces = (pieces) => {
+        pieces.forEach((piece, index) => {
+            piece.classList.add('keep-together');
+            if (index > 0) piece.classList.add('continued');
+            if (index < pieces.length - 1) piece.classList.add('continues');
+        });
+        stats.pieces += pieces.length;
+    };
+
+    const splitTable = (table) => {
+        const body = table.tBodies[0];
+        if (!body || table.tBodies.length > 1) return false;
+        const headHeight = table.tHead ? table.tHead.getBoundingClientRect().height : 0;
+        const groups = [];
+        let group = [];
+        let height = headHeight;
+        for (const row of Array.from(body.rows)) {
+            const rowHeight = row.getBoundingClientRect().height;
+            if (group.length && height + rowHeight > chunkHeight) {
+                // Even-sized groups keep the zebra striping continuous
+                const carried = group.length % 2 && group.length > 1 ? [group.pop()] : [];
+                groups.push(group);
+                group = carried;
+                height = headHeight + carried.reduce((sum, r) => sum + r.getBoundingClientRect().height, 0);
+            }
+            group.push(row);
+            height += rowHeight;
+        }
+        if (!groups.length) return false;
+        const pieces = groups.map(rows => {
+            const piece = table.cloneNode(false);
+            if (table.tHead) piece.appendChild(table.tHead.cloneNode(true));
+            const pieceBody = body.cloneNode(false);
+            rows.forEach(row => pieceBody.appendChild(row));
+            piece.appendChild(pieceBody);
+            table.parentNode.insertBefore(piece, table);
+            return piece;
+        });
+        markPieces([...pieces, table]);
+        return true;
+    };
+
+    const splitCode = (pre) => {
+        const style = getComputedStyle(pre);
+        const lineHeight = parseFloat(style.lineHeight) || parseFloat(style.fontSize) * 1.3;
+        const padding = parseFloat(style.paddingTop) + parseFloat(style.paddingBottom);
+        const maxLines = Math.max(4, Math.floor((chunkHeight - padding) / lineHeight));
+        const lines = pre.textContent.split('\\n');
+        if (lines.length <= maxLines) return false;
+
+        // Character length of each piece, cutting after a blank line where one is close
+        const lengths = [];
+        let start = 0;
+        while (lines.length - start > maxLines) {
+            let cut = start + maxLines;
+            for (let i = cut; i > start + Math.floor(maxLines * 0.75); i--) {
+                if (lines[i - 1].trim() === '') { cut = i; break; }
+            }
+            lengths.push(lines.slice(start, cut).reduce((sum, line) => sum + line.length + 1, 0));
+            start = cut;
+        }
 
-/* Page break handling */
-h2 {
-    page-break-before: auto !important;
+        // Extracting a range keeps the highlighting spans intact on both sides of a cut
+        const pieces = lengths.map(length => {
+            const walker = document.createTreeWalker(pre, NodeFilter.SHOW_TEXT);
+            const range = document.createRange();
+            range.setStart(pre, 0);
+            let remaining = length;
+            for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+                if (remaining <= node.length) { range.setEnd(node, remaining); break; }
+                remaining -= node.length;
+            }
+            const piece = pre.cloneNode(false);
+            piece.appendChild(range.extractContents());
+            pre.parentNode.insertBefore(piece, pre);
+            return piece;
+        });
+        markPieces([...pieces, pre]);
+        return true;
+    };
+
+    for (const block of blocks) {
+        if (!smart || block.getBoundingClientRect().height <= keepHeight) {
+            block.classList.add('keep-together');
+            stats.kept++;
+        } else if (block.tagName === 'TABLE') {
+            if (splitTable(block)) stats.tables++;
+        } else if (splitCode(block)) {
+            stats.code++;
+        }
+    }
+    return stats;
 }
+"""
 
-h1, h2, h3, h4, h5, h6 {
-    page-break-after: avoid !important;
-}
 
-/* Large diagrams get their own page */
-.mermaid.large-diagram {
-    page-break-before: always !important;
-}
-"""
+def async_playwright():
+    """
+    Import Playwright on first use.
+
+    Runs that never open a browser (only cached chunks, or doc_builder.Builder
+    before its first render) should not pay for loading Playwright.
+    """
+    from playwright.async_api import async_playwright as playwright_factory
+    return playwright_factory()
+
+
+def pdf_options(header_footer: bool = True) -> dict:
+    """Playwright page.pdf() options used for every document."""
+    options = {
+        'format': 'A4',
+        'print_background': True,
+        'margin': PDF_MARGIN,
+        'display_header_footer': header_footer,
+        'prefer_css_page_size': False,
+        'scale': 1.0  # Full scale for maximum readability
+    }
+    if header_footer:
+        options['header_template'] = PDF_HEADER_TEMPLATE
+        options['footer_template'] = PDF_FOOTER_TEMPLATE
+    return options
+
+
+def css_inches(length: str) -> float:
+    """Convert a CSS length such as '12mm' to inches."""
+    match = CSS_LENGTH_PATTERN.match(length)
+    if match is None:
+        raise ValueError(f"unsupported length '{length}'")
+    return float(match.group(1)) * CSS_UNIT_PIXELS[match.group(2)] / 96
+
+
+def cdp_pdf_params(options: dict) -> dict:
+    """Translate page.pdf() options into Page.printToPDF parameters that return a stream."""
+    width, height = PAPER_SIZES[options['format']]
+    params = {
+        'paperWidth': width,
+        'paperHeight': height,
+        'printBackground': options['print_background'],
+        'displayHeaderFooter': options['display_header_footer'],
+        'headerTemplate': options.get('header_template', ''),
+        'footerTemplate': options.get('footer_template', ''),
+        'preferCSSPageSize': options['prefer_css_page_size'],
+        'scale': options['scale'],
+        'transferMode': 'ReturnAsStream',
+    }
+    for side, length in options['margin'].items():
+        params[f'margin{side.title()}'] = css_inches(length)
+    return params
+
+
+async def read_cdp_stream(session, handle: str, f) -> int:
+    """Copy a CDP IO stream into a binary file STREAM_READ_SIZE bytes at a time, then close it; returns the size."""
+    written = 0
+    try:
+        while True:
+            chunk = await session.send('IO.read', {'handle': handle, 'size': STREAM_READ_SIZE})
+            data = chunk['data']
+            data = base64.b64decode(data) if chunk.get('base64Encoded') else data.encode('utf-8')
+            f.write(data)
+            written += len(data)
+            if chunk.get('eof'):
+                return written
+    finally:
+        await session.send('IO.close', {'handle': handle})
+
+
+async def print_pdf(page, pdf_path: Path, options: dict, stream: bool = False):
+    """
+    Print a page to pdf_path with the given page.pdf() options.
+
+    page.pdf() hands the whole PDF over as one buffer. With stream, the PDF is
+    printed over a CDP session instead (Page.printToPDF with ReturnAsStream)
+    and written to disk as it is read, so memory stays flat however long it is.
+    """
+    if not stream:
+        await page.pdf(path=str(pdf_path), **options)
+        return
+    session = await page.context.new_cdp_session(page)
+    try:
+        result = await session.send('Page.printToPDF', cdp_pdf_params(options))
+        with open(pdf_path, 'wb') as f:
+            await read_cdp_stream(session, result['stream'], f)
+    finally:
+        await session.detach()
 
 
 async def inject_pdf_styles(page):
@@ -338,37 +364,32 @@ async def inject_pdf_styles(page):
     await page.add_style_tag(content=PDF_CSS)
 
 
-async def wait_for_mermaid_diagrams(page, timeout=45000):
-    """Wait for all Mermaid diagrams to render completely."""
+async def wait_for_layout(page):
+    """Wait for web fonts and two animation frames, i.e. until pending layout has been painted."""
+    await page.evaluate(
+        "() => document.fonts.ready.then(() => new Promise("
+        "r => requestAnimationFrame(() => requestAnimationFrame(r))))"
+    )
+
+
+async def wait_for_mermaid_diagrams(page, entry: dict = None, timeout=45000):
+    """
+    Wait until the page runtime has rendered (or replaced) every Mermaid diagram.
+
+    The page renders all diagrams with a single mermaid.run() call and
+    resolves window.mermaidRendered when done, after swapping any that failed
+    or overran the per-diagram budget for their source. Each diagram's line,
+    duration and outcome are added to entry['mermaid_renders'], and the whole
+    pass to entry['mermaid_ms'], when a report entry is given.
+    """
     try:
-        # Wait for mermaid to be loaded
-        await page.wait_for_function(
-            "typeof mermaid !== 'undefined'",
-            timeout=timeout
-        )
-
-        # Wait for initial rendering
-        await page.wait_for_timeout(3000)
-
-        # Check if there are mermaid divs and wait for them to be processed
-        await page.wait_for_function(
-            """() => {
-                const diagrams = document.querySelectorAll('.mermaid');
-                if (diagrams.length === 0) return true;
-
-                // Check if all diagrams have SVGs
-                for (let d of diagrams) {
-                    if (!d.querySelector('svg') && !d.getAttribute('data-processed')) {
-                        return false;
-                    }
-                }
-                return true;
-            }""",
-            timeout=timeout
-        )
+        stats = await asyncio.wait_for(page.evaluate("() => window.mermaidRendered"), timeout / 1000)
+        if entry is not None:
+            entry.setdefault('mermaid_renders', []).extend(stats['diagrams'])
+            entry['mermaid_ms'] = entry.get('mermaid_ms', 0) + stats['ms']
 
-        # Additional wait for SVG rendering to complete
-        await page.wait_for_timeout(2000)
+        # Let SVG rendering settle
+        await wait_for_layout(page)
 
     except Exception as e:
         print(f"    Warning: Mermaid wait issue: {e}")
@@ -433,6 +454,170 @@ async def optimize_diagrams_for_pdf(page):
     """)
 
 
+async def mark_large_diagrams(page):
+    """Give very tall diagrams their own page; only toggles a class, no restyling."""
+    await page.evaluate("""
+        () => {
+            document.querySelectorAll('.mermaid svg[viewBox]').forEach(svg => {
+                const parts = svg.getAttribute('viewBox').split(' ');
+                if (parts.length === 4 && parseFloat(parts[3]) > parseFloat(parts[2]) * 1.5) {
+                    svg.parentElement.classList.add('large-diagram');
+                }
+            });
+        }
+    """)
+
+
+async def paginate_blocks(page, smart: bool = True) -> dict:
+    """
+    Measure code blocks and tables at print width and set their page breaks.
+
+    Short blocks are kept on one page; long ones are split into pieces that
+    Chromium can place on consecutive pages without searching for a break
+    inside them. With smart=False every block is kept whole, as before.
+    Returns counts of kept blocks, split tables and code blocks, and pieces.
+    """
+    await page.emulate_media(media='print')
+    await page.set_viewport_size(PRINT_VIEWPORT)
+    return await page.evaluate(PAGINATE_BLOCKS_SCRIPT, {
+        'pageHeight': PRINT_PAGE_HEIGHT,
+        'keepFraction': KEEP_TOGETHER_FRACTION,
+        'chunkFraction': SPLIT_CHUNK_FRACTION,
+        'smart': smart,
+    })
+
+
+def count_pdf_pages(pdf_path: Path) -> int:
+    """Number of pages in a PDF."""
+    if PdfReader is not None:
+        return len(PdfReader(pdf_path).pages)
+    return len(PDF_PAGE_PATTERN.findall(pdf_path.read_bytes()))
+
+
+class PageTracer:
+    """
+    CDP session on one page that records Performance.getMetrics after each
+    pipeline stage into entry['metrics'], and optionally a full Chrome trace.
+    """
+
+    def __init__(self, page, trace_path: Path = None):
+        self.page = page
+        self.trace_path = trace_path
+        self.session = None
+        self.last = None
+
+    async def start(self):
+        self.session = await self.page.context.new_cdp_session(self.page)
+        await self.session.send('Performance.enable')
+        if self.trace_path is not None:
+            await self.session.send('Tracing.start', {
+                'transferMode': 'ReturnAsStream',
+                'traceConfig': {'includedCategories': TRACE_CATEGORIES},
+            })
+        self.last = await self.metrics()
+
+    async def metrics(self) -> dict:
+        result = await self.session.send('Performance.getMetrics')
+        return {metric['name']: metric['value'] for metric in result['metrics'] if metric['name'] in TRACE_METRICS}
+
+    async def mark(self, entry: dict, stage: str):
+        """Add the metrics accumulated since the previous mark to entry['metrics'][stage]."""
+        current = await self.metrics()
+        stage_metrics = entry.setdefault('metrics', {}).setdefault(stage, {})
+        for name, value in current.items():
+            if name in TRACE_LEVEL_METRICS:
+                stage_metrics[name] = max(stage_metrics.get(name, 0), value)
+            else:
+                stage_metrics[name] = round(stage_metrics.get(name, 0) + value - self.last.get(name, 0), 4)
+        self.last = current
+
+    async def stop(self):
+        """Write the trace, if one was started, and detach the session."""
+        if self.trace_path is not None:
+            complete = asyncio.get_running_loop().create_future()
+            self.session.once('Tracing.tracingComplete', complete.set_result)
+            await self.session.send('Tracing.end')
+            stream = (await complete)['stream']
+            self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.trace_path, 'wb') as f:
+                await read_cdp_stream(self.session, stream, f)
+        await self.session.detach()
+
+
+@asynccontextmanager
+async def traced_stage(entry: dict, stage: str, tracer: PageTracer = None):
+    """Time a pipeline stage and, when tracing, record its Chromium metrics."""
+    with stage_timer(entry, stage):
+        yield
+    if tracer is not None:
+        await tracer.mark(entry, stage)
+
+
+async def prepare_print_page(page, html_path: Path, entry: dict, tracer: PageTracer = None):
+    """
+    Load a print variant, whose head already carries PDF_CSS.
+
+    Print media is emulated and the viewport matches the printed width before
+    navigation, so Mermaid lays the diagrams out once at their final size.
+    """
+    await page.emulate_media(media='print')
+    await page.set_viewport_size(PRINT_VIEWPORT)
+
+    async with traced_stage(entry, 'load', tracer):
+        await page.goto(f'file://{html_path.absolute()}', wait_until='load')
+
+    async with traced_stage(entry, 'mermaid', tracer):
+        await wait_for_mermaid_diagrams(page, entry)
+
+    async with traced_stage(entry, 'styles', tracer):
+        await mark_large_diagrams(page)
+
+
+async def prepare_page(page, html_path: Path, entry: dict = None, smart_pagination: bool = True,
+                       tracer: PageTracer = None, print_dir: Path = PRINT_DIR):
+    """
+    Load an HTML file and bring it into its final print layout.
+
+    Print variants (pages in print_dir) take the single-layout path. Stage
+    timings are added to entry['stages'] when a report entry is given, and
+    Chromium metrics per stage to entry['metrics'] when a tracer is given.
+    """
+    entry = entry if entry is not None else {'stages': {}}
+    if html_path.parent.resolve() == print_dir.resolve():
+        await prepare_print_page(page, html_path, entry, tracer)
+    else:
+        await prepare_screen_page(page, html_path, entry, tracer)
+
+    async with traced_stage(entry, 'paginate', tracer):
+        stats = await paginate_blocks(page, smart_pagination)
+    entry['split_blocks'] = entry.get('split_blocks', 0) + stats['tables'] + stats['code']
+
+
+async def prepare_screen_page(page, html_path: Path, entry: dict, tracer: PageTracer = None):
+    """Load a screen page and restyle it for print after the diagrams have rendered."""
+    # Set a larger viewport for better diagram rendering
+    await page.set_viewport_size({"width": 1400, "height": 900})
+
+    # Navigate to the HTML file
+    async with traced_stage(entry, 'load', tracer):
+        file_url = f'file://{html_path.absolute()}'
+        await page.goto(file_url, wait_until='load')
+
+    # Wait for Mermaid diagrams to render
+    async with traced_stage(entry, 'mermaid', tracer):
+        await wait_for_mermaid_diagrams(page, entry)
+
+    async with traced_stage(entry, 'styles', tracer):
+        # Inject PDF-specific styles
+        await inject_pdf_styles(page)
+
+        # Optimize diagrams for PDF
+        await optimize_diagrams_for_pdf(page)
+
+        # Wait for styles to apply
+        await wait_for_layout(page)
+
+
 async def generate_pdf(html_path: Path, pdf_path: Path):
     """Generate a PDF from an HTML file with optimized diagram rendering."""
     async with async_playwright() as p:
@@ -440,51 +625,10 @@ async def generate_pdf(html_path: Path, pdf_path: Path):
         page = await browser.new_page()
 
         try:
-            # Set a larger viewport for better diagram rendering
-            await page.set_viewport_size({"width": 1400, "height": 900})
-
-            # Navigate to the HTML file
-            file_url = f'file://{html_path.absolute()}'
-            await page.goto(file_url, wait_until='networkidle')
-
-            # Wait for Mermaid diagrams to render
-            await wait_for_mermaid_diagrams(page)
-
-            # Inject PDF-specific styles
-            await inject_pdf_styles(page)
-
-            # Optimize diagrams for PDF
-            await optimize_diagrams_for_pdf(page)
-
-            # Additional wait for styles to apply
-            await page.wait_for_timeout(1500)
+            await prepare_page(page, html_path)
 
             # Generate PDF with optimized settings
-            await page.pdf(
-                path=str(pdf_path),
-                format='A4',
-                print_background=True,
-                margin={
-                    'top': '12mm',
-                    'right': '10mm',
-                    'bottom': '15mm',
-                    'left': '10mm'
-                },
-                display_header_footer=True,
-                header_template='''
-                    <div style="font-size: 8pt; color: #718096; width: 100%; text-align: center; padding: 5px 10mm;">
-                        Securaa Platform Documentation
-                    </div>
-                ''',
-                footer_template='''
-                    <div style="font-size: 8pt; color: #718096; width: 100%; padding: 5px 10mm; display: flex; justify-content: space-between;">
-                        <span>Confidential</span>
-                        <span>Page <span class="pageNumber"></span> of <span class="totalPages"></span></span>
-                    </div>
-                ''',
-                prefer_css_page_size=False,
-                scale=1.0  # Full scale for maximum readability
-            )
+            await page.pdf(path=str(pdf_path), **pdf_options())
 
             print(f"  Generated: {pdf_path.name}")
 
@@ -496,38 +640,894 @@ async def generate_pdf(html_path: Path, pdf_path: Path):
             await browser.close()
 
 
-async def main():
+def split_sections(html: str) -> tuple:
+    """
+    Split a generated page into (prefix, sections, suffix).
+
+    prefix and suffix surround the contents of <main>, sections holds the
+    preamble before the first <h2> followed by one entry per <h2> section.
+    """
+    match = MAIN_OPEN_PATTERN.search(html)
+    end = html.rfind('</main>')
+    if not match or end < match.end():
+        raise ValueError('page has no <main class="main-content"> element')
+    content = html[match.end():end]
+    sections = [section for section in SECTION_SPLIT_PATTERN.split(content) if section.strip()]
+    return html[:match.end()], sections, html[end:]
+
+
+def section_title(section: str, fallback: str) -> str:
+    """Plain-text title of a section, used for the PDF outline."""
+    match = SECTION_TITLE_PATTERN.search(section)
+    if not match:
+        return fallback
+    return html_lib.unescape(TAG_PATTERN.sub('', match.group(1))).strip() or fallback
+
+
+def page_fingerprint(prefix: str, suffix: str, smart_pagination: bool = True) -> str:
+    """
+    Hash everything besides the section body that affects a chunk's output.
+
+    Only <head> and the trailing scripts are included: the header, navigation
+    and footer markup (which carry the generation date) are hidden in print.
+    """
+    head = prefix[:prefix.find('<body')]
+    scripts = suffix[suffix.find('</footer>'):]
+    pagination = f'{PAGINATE_BLOCKS_SCRIPT}{smart_pagination}{PRINT_PAGE_HEIGHT}{KEEP_TOGETHER_FRACTION}{SPLIT_CHUNK_FRACTION}'
+    digest = hashlib.sha256()
+    for part in (head, scripts, PDF_CSS, pagination, repr(pdf_options(header_footer=False))):
+        digest.update(part.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def detect_memory_limit() -> int:
+    """Memory available to this process tree in bytes: cgroup limit, else physical memory."""
+    for limit_file in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            value = Path(limit_file).read_text().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "unlimited" as a huge number rather than "max"
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return 4 * 1024 ** 3
+
+
+def detect_cpu_limit() -> int:
+    """Usable CPUs: cgroup CPU quota if set, else the scheduler affinity mask."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        try:
+            quota = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us').read_text())
+            period = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us').read_text())
+            if quota > 0:
+                cpus = min(cpus, max(1, quota // period))
+        except (OSError, ValueError):
+            pass
+    return cpus
+
+
+def process_tree_rss(*root_pids: int) -> int:
+    """
+    Total RSS in bytes of all descendants of root_pids (default: this process),
+    each counted once.
+
+    The Playwright driver and every Chromium process it launches are
+    descendants of the generator, so by default this is the browser's memory
+    footprint; the render daemon's Chromium descends from the daemon's pid
+    instead. Returns 0 where /proc is not available.
+    """
+    root_pids = root_pids or (os.getpid(),)
+    children = {}
+    rss = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                stat = f.read()
+            with open(f'/proc/{entry}/statm', 'rb') as f:
+                resident_pages = int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        # The command name may contain spaces, so parse after its closing parenthesis
+        ppid = int(stat[stat.rindex(b')') + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+        rss[int(entry)] = resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+    seen = set()
+    stack = [child for root_pid in root_pids for child in children.get(root_pid, [])]
+    while stack:
+        pid = stack.pop()
+        if pid not in seen:
+            seen.add(pid)
+            stack.extend(children.get(pid, []))
+    return sum(rss.get(pid, 0) for pid in seen)
+
+
+class AdaptiveLimiter:
+    """
+    Bounds the number of pages rendering at once.
+
+    The limit starts at half of max_pages and follows the sampled browser RSS:
+    it halves when RSS crosses the high watermark of the memory budget and
+    grows by one page per finished document while RSS stays below the low
+    watermark. RSS is the sum over the process trees of this process and of
+    any process added with watch (the render daemon).
+    """
+
+    def __init__(self, max_pages: int, memory_budget: int):
+        self.max_pages = max_pages
+        self.memory_budget = memory_budget
+        self.limit = max(1, max_pages // 2)
+        self.in_flight = 0
+        self.peak_rss = 0
+        self.last_rss = 0
+        self.root_pids = [os.getpid()]
+        self._condition = asyncio.Condition()
+
+    @property
+    def over_budget(self) -> bool:
+        return self.last_rss > self.memory_budget * MEMORY_HIGH_WATERMARK
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            if self.last_rss < self.memory_budget * MEMORY_LOW_WATERMARK and self.limit < self.max_pages:
+                self.limit += 1
+            self._condition.notify_all()
+
+    def watch(self, pid: int):
+        """Also sample the process tree of pid, for a browser this process did not launch."""
+        if pid not in self.root_pids:
+            self.root_pids.append(pid)
+
+    def record(self, rss: int):
+        """Record an RSS sample, backing off when over the high watermark."""
+        self.last_rss = rss
+        self.peak_rss = max(self.peak_rss, rss)
+        if self.over_budget and self.limit > 1:
+            self.limit = max(1, self.limit // 2)
+
+    async def monitor(self):
+        """Sample the browser process tree until cancelled."""
+        while True:
+            self.record(process_tree_rss(*self.root_pids))
+            await asyncio.sleep(MEMORY_SAMPLE_INTERVAL)
+
+
+async def connect_browser(playwright, use_daemon: bool = True) -> tuple:
+    """
+    Connect to the render daemon over CDP, or launch Chromium if it is absent.
+
+    Returns (browser, daemon_pid) where daemon_pid is the daemon's process,
+    whose descendants run the browser, or None for a launched browser.
+    """
+    if use_daemon:
+        try:
+            state = json.loads(DAEMON_STATE_FILE.read_text(encoding='utf-8'))
+            browser = await playwright.chromium.connect_over_cdp(state['endpoint'], timeout=DAEMON_CONNECT_TIMEOUT)
+            return browser, state['pid']
+        except (OSError, ValueError, KeyError):
+            pass
+        except Exception as e:
+            print(f"  Warning: render daemon unavailable, launching Chromium: {e}")
+    return await playwright.chromium.launch(), None
+
+
+class RenderPool:
+    """
+    Shared browser handing out pages from a recyclable context.
+
+    The browser is connected (render daemon) or launched on the first
+    request, so runs that only reuse cached chunks never start it. The
+    current context is retired after docs_per_context documents, or when the
+    limiter reports memory over budget, and closed once its last page is
+    released. With the daemon, pages open in its persistent context, which
+    holds the warm caches and is never recycled, and the limiter samples the
+    daemon's process tree as well as this one. Pages in print_dir are
+    rendered as print variants; chunk_dir holds the --chunked section cache.
+    """
+
+    def __init__(self, limiter: AdaptiveLimiter, docs_per_context: int = DOCS_PER_CONTEXT,
+                 use_daemon: bool = True, smart_pagination: bool = True, trace_metrics: bool = False,
+                 trace_dir: Path = None, diagram_budget: int = MERMAID_RENDER_BUDGET,
+                 stream_pdf: bool = False, print_dir: Path = PRINT_DIR, chunk_dir: Path = CHUNK_CACHE_DIR):
+        self.limiter = limiter
+        self.docs_per_context = docs_per_context
+        self.use_daemon = use_daemon
+        self.smart_pagination = smart_pagination
+        self.trace_metrics = trace_metrics or trace_dir is not None
+        self.trace_dir = trace_dir
+        self.diagram_budget = diagram_budget
+        self.stream_pdf = stream_pdf
+        self.print_dir = print_dir
+        self.chunk_dir = chunk_dir
+        self.overlay_locks = {}
+        self.playwright = None
+        self.browser = None
+        self.daemon = False
+        self.context = None
+        self.context_docs = 0
+        self.open_pages = {}
+        self.recycled = 0
+        self._lock = asyncio.Lock()
+
+    async def new_page(self):
+        async with self._lock:
+            if self.browser is None:
+                self.playwright = await async_playwright().start()
+                self.browser, daemon_pid = await connect_browser(self.playwright, self.use_daemon)
+                self.daemon = daemon_pid is not None
+                if self.daemon:
+                    # The daemon's Chromium is not our child; count its memory too
+                    self.limiter.watch(daemon_pid)
+            if self.context is None or (not self.daemon and (
+                    self.context_docs >= self.docs_per_context or self.limiter.over_budget)):
+                await self._retire_context()
+                if self.daemon:
+                    self.context = self.browser.contexts[0]
+                else:
+                    self.context = await self.browser.new_context()
+                self.context_docs = 0
+                self.open_pages[self.context] = 0
+            self.context_docs += 1
+            self.open_pages[self.context] += 1
+            page = await self.context.new_page()
+        if self.diagram_budget:
+            await page.add_init_script(f'window.MERMAID_RENDER_BUDGET = {int(self.diagram_budget)};')
+        return page
+
+    async def start_tracer(self, page, name: str):
+        """Attach a PageTracer to page when tracing is on; name is the trace file's stem."""
+        if not self.trace_metrics:
+            return None
+        tracer = PageTracer(page, self.trace_dir / f'{name}.json' if self.trace_dir else None)
+        await tracer.start()
+        return tracer
+
+    async def release_page(self, page):
+        context = page.context
+        await page.close()
+        async with self._lock:
+            self.open_pages[context] -= 1
+            if context is not self.context and self.open_pages[context] == 0:
+                del self.open_pages[context]
+                await context.close()
+
+    async def _retire_context(self):
+        if self.context is None:
+            return
+        if self.context_docs:
+            self.recycled += 1
+        if self.open_pages[self.context] == 0:
+            del self.open_pages[self.context]
+            await self.context.close()
+        self.context = None
+
+    async def close(self):
+        # For the daemon this only disconnects; the warm browser keeps running
+        if self.browser is not None:
+            await self.browser.close()
+        if self.playwright is not None:
+            await self.playwright.stop()
+
+
+async def render_pdf(pool: RenderPool, html_path: Path, pdf_path: Path, entry: dict):
+    """Generate a PDF on a page from the shared render pool."""
+    tmp_path = pdf_path.with_suffix('.pdf.tmp')
+    page = await pool.new_page()
+    try:
+        tracer = await pool.start_tracer(page, pdf_path.stem)
+        await prepare_page(page, html_path, entry, pool.smart_pagination, tracer, pool.print_dir)
+        # Print to a temporary file, so a killed run never leaves a truncated PDF
+        async with traced_stage(entry, 'pdf', tracer):
+            await print_pdf(page, tmp_path, pdf_options(), pool.stream_pdf)
+        if tracer is not None:
+            await tracer.stop()
+        os.replace(tmp_path, pdf_path)
+        entry['cache_misses'] += 1
+        print(f"  Generated: {pdf_path.name}")
+    finally:
+        await pool.release_page(page)
+        tmp_path.unlink(missing_ok=True)
+
+
+async def render_chunk(pool: RenderPool, html_path: Path, chunk_html: str, chunk_path: Path, entry: dict):
+    """Render one section page to a cached chunk PDF without header and footer."""
+    # Keep the chunk page next to its source so relative links resolve the same way
+    chunk_html_path = html_path.with_name(f'.{chunk_path.stem}.html')
+    tmp_path = chunk_path.with_suffix('.tmp')
+    chunk_html_path.write_text(chunk_html, encoding='utf-8')
+    page = await pool.new_page()
+    try:
+        tracer = await pool.start_tracer(page, f'{html_path.stem}.{chunk_path.stem[:12]}')
+        await prepare_page(page, chunk_html_path, entry, pool.smart_pagination, tracer, pool.print_dir)
+        async with traced_stage(entry, 'pdf', tracer):
+            await print_pdf(page, tmp_path, pdf_options(header_footer=False), pool.stream_pdf)
+        if tracer is not None:
+            await tracer.stop()
+        os.replace(tmp_path, chunk_path)
+    finally:
+        await pool.release_page(page)
+        chunk_html_path.unlink(missing_ok=True)
+
+
+async def header_footer_overlay(pool: RenderPool, total_pages: int) -> Path:
+    """Return a cached PDF of blank pages carrying the header and "Page X of Y" footer."""
+    digest = hashlib.sha256(
+        f'{PDF_HEADER_TEMPLATE}{PDF_FOOTER_TEMPLATE}{PDF_MARGIN}{total_pages}'.encode('utf-8')
+    ).hexdigest()
+    overlay_path = pool.chunk_dir / f'overlay-{digest}.pdf'
+    # Documents with the same page count render concurrently; only the first renders the overlay
+    async with pool.overlay_locks.setdefault(digest, asyncio.Lock()):
+        if overlay_path.exists():
+            return overlay_path
+
+        sheets = '<div class="sheet"></div>' * total_pages
+        options = pdf_options()
+        options['print_background'] = False
+        # A temporary file of its own, in case another process shares the chunk cache
+        fd, tmp_name = tempfile.mkstemp(dir=pool.chunk_dir, prefix=f'overlay-{digest}.', suffix='.tmp')
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        try:
+            page = await pool.new_page()
+            try:
+                await page.set_content(OVERLAY_HTML.substitute(sheets=sheets))
+                await print_pdf(page, tmp_path, options, pool.stream_pdf)
+            finally:
+                await pool.release_page(page)
+
+            rendered_pages = len(PdfReader(tmp_path).pages)
+            if rendered_pages != total_pages:
+                raise RuntimeError(f"overlay has {rendered_pages} pages, expected {total_pages}")
+            os.replace(tmp_path, overlay_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return overlay_path
+
+
+def merge_chunks(sections: list, readers: list, overlay_path: Path, pdf_path: Path):
+    """Merge chunk PDFs into pdf_path with one outline entry per section and the overlay stamped on."""
+    document_title = section_title(sections[0], pdf_path.stem)
+    writer = PdfWriter()
+    for index, (section, reader) in enumerate(zip(sections, readers)):
+        start_page = len(writer.pages)
+        for chunk_page in reader.pages:
+            writer.add_page(chunk_page)
+        title = document_title if index == 0 else section_title(section, f'Section {index}')
+        writer.add_outline_item(title, start_page)
+
+    overlay = PdfReader(overlay_path)
+    for merged_page, overlay_page in zip(writer.pages, overlay.pages):
+        merged_page.merge_page(overlay_page)
+
+    tmp_path = pdf_path.with_suffix('.pdf.tmp')
+    with open(tmp_path, 'wb') as f:
+        writer.write(f)
+    os.replace(tmp_path, pdf_path)
+
+
+async def generate_chunked_pdf(pool: RenderPool, html_path: Path, pdf_path: Path, entry: dict) -> set:
+    """
+    Generate a PDF section by section, reusing cached chunks for unchanged sections.
+
+    Each top-level section is rendered on its own and cached under a hash of its
+    HTML, so only edited sections go through Chromium. The chunks are merged with
+    an outline entry per section, and the header and footer are stamped over the
+    merged pages so page numbers run across the whole document.
+    Reused chunks count as cache hits in the report entry.
+    Returns the cache keys used, for pruning stale chunks.
+    """
+    html = html_path.read_text(encoding='utf-8')
+    prefix, sections, suffix = split_sections(html)
+    fingerprint = page_fingerprint(prefix, suffix, pool.smart_pagination)
+    keys = [hashlib.sha256((fingerprint + section).encode('utf-8')).hexdigest() for section in sections]
+
+    pool.chunk_dir.mkdir(parents=True, exist_ok=True)
+    rendered = 0
+    for section, key in zip(sections, keys):
+        chunk_path = pool.chunk_dir / f'{key}.pdf'
+        if chunk_path.exists():
+            entry['cache_hits'] += 1
+        else:
+            await render_chunk(pool, html_path, prefix + section + suffix, chunk_path, entry)
+            entry['cache_misses'] += 1
+            rendered += 1
+
+    readers = [PdfReader(pool.chunk_dir / f'{key}.pdf') for key in keys]
+    total_pages = sum(len(reader.pages) for reader in readers)
+    with stage_timer(entry, 'overlay'):
+        overlay_path = await header_footer_overlay(pool, total_pages)
+
+    with stage_timer(entry, 'merge'):
+        merge_chunks(sections, readers, overlay_path, pdf_path)
+
+    print(f"  Generated: {pdf_path.name} ({rendered}/{len(keys)} sections rendered)")
+    return set(keys) | {overlay_path.stem}
+
+
+def prune_chunk_cache(used_keys: set, chunk_dir: Path = CHUNK_CACHE_DIR):
+    """Remove cached chunks in chunk_dir that no document referenced in this run."""
+    if not chunk_dir.exists():
+        return
+    for chunk_path in chunk_dir.glob('*.pdf'):
+        if chunk_path.stem not in used_keys:
+            chunk_path.unlink()
+
+
+def checkpoint_fingerprint(args) -> str:
+    """Hash this generator, the print styles and the options that change a PDF's content."""
+    digest = hashlib.sha256()
+    for path in (Path(__file__), Path(__file__).with_name('pdf_styles.py')):
+        digest.update(path.read_bytes())
+    options = {
+        'chunked': args.chunked,
+        'no_print_variant': args.no_print_variant,
+        'no_smart_pagination': args.no_smart_pagination,
+        'diagram_budget': args.diagram_budget,
+        'backend': args.backend,
+    }
+    digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def page_source(html_path: Path) -> tuple:
+    """
+    The source digest and part ('2/5', or '1/1' for a whole document) that
+    generate_documentation.py stamps into a page's head.
+    """
+    head = html_path.read_text(encoding='utf-8').split('</head>', 1)[0]
+    fields = dict(PAGE_META_PATTERN.findall(head))
+    return fields.get('source-digest', ''), fields.get('document-part', '1/1')
+
+
+def input_digest(html_path: Path) -> str:
+    """Hash the page a PDF is rendered from, including which page (screen or print) it is."""
+    digest = hashlib.sha256(html_path.as_posix().encode('utf-8'))
+    digest.update(html_path.read_bytes())
+    return digest.hexdigest()
+
+
+def load_checkpoint(path: Path, fingerprint: str, resume: bool) -> dict:
+    """
+    Load the checkpoint of an earlier run when resuming with the same settings,
+    otherwise start an empty one.
+    """
+    checkpoint = None
+    if resume:
+        try:
+            checkpoint = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            checkpoint = None
+    if not checkpoint or checkpoint.get('fingerprint') != fingerprint:
+        return {'fingerprint': fingerprint, 'documents': {}}
+    return checkpoint
+
+
+def save_checkpoint(path: Path, checkpoint: dict):
+    """Write the checkpoint atomically, so a killed run leaves the previous one intact."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(json.dumps(checkpoint, separators=(',', ':')), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def finished_document(checkpoint: dict, pdf_file: str, digest: str, pdf_path: Path):
+    """
+    Return the checkpoint record of a document that finished from the same input
+    and whose PDF is still in place, else None.
+    """
+    record = checkpoint['documents'].get(pdf_file)
+    if (record is None or record['input'] != digest or not pdf_path.exists()
+            or pdf_path.stat().st_size != record['entry']['output_bytes']):
+        return None
+    return record
+
+
+async def checkpointed_render(backends: list, html_path: Path, pdf_path: Path, chunked: bool,
+                              entry: dict, checkpoint: dict, digest: str) -> set:
+    """Render one document and record it in the checkpoint as soon as it is finished."""
+    used_chunks = await render_document(backends, html_path, pdf_path, chunked, entry)
+    checkpoint['documents'][pdf_path.name] = {
+        'input': digest,
+        'entry': entry,
+        'chunks': sorted(used_chunks),
+    }
+    save_checkpoint(CHECKPOINT_PATH, checkpoint)
+    return used_chunks
+
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description='Generate Securaa PDF documentation.')
+    parser.add_argument('--chunked', action='store_true',
+                        help='render each top-level section separately and reuse cached chunks '
+                             '(requires pypdf)')
+    parser.add_argument('--max-pages', type=int, default=None,
+                        help='upper bound on documents rendered at once '
+                             '(default: from detected CPU and memory limits)')
+    parser.add_argument('--memory-budget', type=int, default=None, metavar='MB',
+                        help='browser memory budget in MB '
+                             f'(default: {int(MEMORY_BUDGET_FRACTION * 100)}%% of the detected limit)')
+    parser.add_argument('--docs-per-context', type=int, default=DOCS_PER_CONTEXT,
+                        help='recycle the browser context after this many documents')
+    parser.add_argument('--no-print-variant', action='store_true',
+                        help='render the screen pages and restyle them for print, '
+                             'even where a print variant exists (not for split documents)')
+    parser.add_argument('--backend', choices=['chromium', 'weasyprint'], default='chromium',
+                        help='chromium: Chromium for everything; weasyprint: render pages without diagrams '
+                             'to render browser-free with WeasyPrint and the rest with Chromium')
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='always launch Chromium instead of connecting to render_daemon.py')
+    parser.add_argument('--stream-pdf', action='store_true',
+                        help='print over a CDP session and stream each PDF to disk in chunks instead of '
+                             'receiving it as one buffer (lower peak memory for long documents)')
+    parser.add_argument('--no-smart-pagination', action='store_true',
+                        help='keep every code block and table on one page instead of splitting long ones')
+    parser.add_argument('--diagram-budget', type=int, default=MERMAID_RENDER_BUDGET, metavar='MS',
+                        help='per-diagram render budget; slower diagrams print as source (page default: 10000)')
+    parser.add_argument('--trace-metrics', action='store_true',
+                        help='record Chromium performance metrics per stage and print the worst documents')
+    parser.add_argument('--trace-dir', type=Path, default=None, metavar='DIR',
+                        help='also save a full Chrome trace per document to DIR '
+                             '(implies --trace-metrics, renders one page at a time)')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip documents a previous (possibly interrupted) run finished, '
+                             'if their input page has not changed since')
+    parser.add_argument('--shard', metavar='i/N',
+                        help='render only shard i of N, balanced by the costs in the previous report')
+    add_report_arguments(parser, REPORT_DIR / 'pdf-report.json')
+    return parser.parse_args(argv)
+
+
+def needs_browser(html: str) -> bool:
+    """True if the page has Mermaid diagrams that are not already rendered to inline SVG."""
+    return any(match.group(1) is None for match in MERMAID_DIV_PATTERN.finditer(html))
+
+
+class ChromiumBackend:
+    """
+    Renders on the shared browser pool, once the limiter admits another page.
+    Accepts every document, so it goes last in the backend list.
+    """
+
+    name = 'chromium'
+
+    def __init__(self, pool: RenderPool):
+        self.pool = pool
+
+    def accepts(self, html: str) -> bool:
+        return True
+
+    async def render(self, html_path: Path, pdf_path: Path, chunked: bool, entry: dict) -> set:
+        """Render html_path to pdf_path; returns the chunk cache keys used."""
+        await self.pool.limiter.acquire()
+        try:
+            if chunked:
+                return await generate_chunked_pdf(self.pool, html_path, pdf_path, entry)
+            await render_pdf(self.pool, html_path, pdf_path, entry)
+            return set()
+        finally:
+            await self.pool.limiter.release()
+
+
+class WeasyPrintBackend:
+    """
+    Browser-free rendering with WeasyPrint, for pages without diagrams or
+    whose diagrams are already inline SVG: no Chromium launch, no Mermaid
+    waits. The page is laid out from the same PDF_CSS (baked into print
+    variants, added to screen pages) plus WEASYPRINT_PAGE_CSS for the header
+    and footer. WeasyPrint is CPU-bound, so documents render one at a time
+    in a worker thread, and always whole, even with --chunked. Pages in
+    print_dir are print variants and get no extra PDF_CSS.
+    """
+
+    name = 'weasyprint'
+
+    def __init__(self, print_dir: Path = PRINT_DIR):
+        self.print_dir = print_dir
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec('weasyprint') is not None
+
+    def accepts(self, html: str) -> bool:
+        return not needs_browser(html)
+
+    async def render(self, html_path: Path, pdf_path: Path, chunked: bool, entry: dict) -> set:
+        tmp_path = pdf_path.with_suffix('.pdf.tmp')
+        async with self._lock:
+            try:
+                with stage_timer(entry, 'pdf'):
+                    await asyncio.to_thread(self.write_pdf, html_path, tmp_path)
+                os.replace(tmp_path, pdf_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+        entry['cache_misses'] += 1
+        print(f"  Generated: {pdf_path.name} (browser-free)")
+        return set()
+
+    def write_pdf(self, html_path: Path, pdf_path: Path):
+        # Imported on first use: WeasyPrint is slow to import and optional
+        from weasyprint import CSS, HTML
+        stylesheets = [CSS(string=WEASYPRINT_PAGE_CSS)]
+        if html_path.parent.resolve() != self.print_dir.resolve():
+            stylesheets.insert(0, CSS(string=PDF_CSS))
+        HTML(filename=str(html_path)).write_pdf(str(pdf_path), stylesheets=stylesheets)
+
+
+def pdf_backends(pool: RenderPool, backend: str = 'chromium') -> list:
+    """
+    Backends in the order they are offered each document; Chromium takes whatever is left.
+    WeasyPrint is only used when asked for by name: it skips the smart pagination and
+    diagram sizing scripts, so its output is not identical to Chromium's.
+    """
+    backends = []
+    if backend == 'weasyprint':
+        backends.append(WeasyPrintBackend(pool.print_dir))
+    backends.append(ChromiumBackend(pool))
+    return backends
+
+
+async def render_document(backends: list, html_path: Path, pdf_path: Path, chunked: bool,
+                          entry: dict) -> set:
+    """Render one document with the first backend that accepts it."""
+    html = html_path.read_text(encoding='utf-8')
+    entry['input_bytes'] = len(html.encode('utf-8'))
+    entry['diagrams'], entry['code_blocks'] = count_blocks(html)
+    backend = next(backend for backend in backends if backend.accepts(html))
+    del html
+
+    entry['backend'] = backend.name
+    used_chunks = await backend.render(html_path, pdf_path, chunked, entry)
+
+    entry['output_bytes'] = pdf_path.stat().st_size
+    entry['pages'] = count_pdf_pages(pdf_path)
+    return used_chunks
+
+
+def print_metrics_summary(report: BuildReport, limit: int = TRACE_SUMMARY_ROWS):
+    """Print the documents with the most Chromium task time and the stage that dominates each."""
+    rows = []
+    for name, doc in report.documents.items():
+        metrics = doc.get('metrics')
+        if not metrics:
+            continue
+        totals = {
+            metric: sum(stage.get(metric, 0) for stage in metrics.values())
+            for metric in TRACE_METRICS if metric not in TRACE_LEVEL_METRICS
+        }
+        heap = max(stage.get('JSHeapUsedSize', 0) for stage in metrics.values())
+        worst_stage = max(metrics, key=lambda stage: metrics[stage].get('TaskDuration', 0))
+        rows.append((totals, heap, worst_stage, name))
+    if not rows:
+        return
+
+    rows.sort(key=lambda row: (-row[0]['TaskDuration'], row[3]))
+    print(f"\n=== Slowest Documents (Chromium metrics) ===")
+    print(f"  {'document':<50} {'task s':>7} {'script s':>8} {'layouts':>7} {'layout s':>8} "
+          f"{'recalcs':>7} {'style s':>7} {'heap MB':>7}  worst stage")
+    for totals, heap, worst_stage, name in rows[:limit]:
+        print(f"  {name:<50} {totals['TaskDuration']:>7.2f} {totals['ScriptDuration']:>8.2f} "
+              f"{totals['LayoutCount']:>7.0f} {totals['LayoutDuration']:>8.2f} "
+              f"{totals['RecalcStyleCount']:>7.0f} {totals['RecalcStyleDuration']:>7.2f} "
+              f"{heap / 2 ** 20:>7.1f}  {worst_stage}")
+
+
+def print_diagram_fallbacks(report: BuildReport) -> int:
+    """
+    Record and print the diagrams that failed or overran their budget, as source:line.
+    Returns how many there were.
+    """
+    fallbacks = []
+    for name, doc in sorted(report.documents.items()):
+        source = name.replace('.pdf', '.md')
+        failed = [render for render in doc.get('mermaid_renders', []) if render['status'] != 'ok']
+        doc['mermaid_fallbacks'] = [dict(render, source=source) for render in failed]
+        fallbacks.extend(doc['mermaid_fallbacks'])
+    if fallbacks:
+        print(f"\n=== Diagrams Printed as Source: {len(fallbacks)} ===")
+        for render in fallbacks:
+            print(f"  {render['source']}:{render['line']}: {render['status']} after {render['ms']} ms"
+                  f"{'' if render['status'] == 'over-budget' else ' - ' + render['error']}")
+    return len(fallbacks)
+
+
+def print_page_counts(report: BuildReport, baseline: dict):
+    """Print page counts, with the change against the baseline report where it has them."""
+    previous = {
+        name: doc['pages'] for name, doc in ((baseline or {}).get('documents') or {}).items() if 'pages' in doc
+    }
+    total = 0
+    total_before = 0
+    changes = []
+    for name, doc in sorted(report.documents.items()):
+        if 'pages' not in doc:
+            continue
+        total += doc['pages']
+        if name in previous:
+            total_before += previous[name]
+            if previous[name] != doc['pages']:
+                changes.append(f"    {name}: {previous[name]} -> {doc['pages']}")
+    if not previous:
+        print(f"  Pages: {total}")
+        return
+    print(f"  Pages: {total} (baseline {total_before}, {total - total_before:+d})")
+    for change in changes:
+        print(change)
+
+
+async def main(argv=None) -> int:
     """Main function to generate all PDFs."""
+    args = parse_args(argv)
+    if args.chunked and PdfWriter is None:
+        print("Error: --chunked requires pypdf (pip install pypdf)")
+        return 2
+    if args.backend == 'weasyprint' and not WeasyPrintBackend.available():
+        print("Error: --backend weasyprint requires WeasyPrint (pip install weasyprint)")
+        return 2
+    selected = None
+    if args.shard:
+        sizes = {
+            html_file.replace('.html', '.pdf'): (DOCS_DIR / html_file).stat().st_size
+            for html_file in HTML_FILES
+            if (DOCS_DIR / html_file).exists()
+        }
+        try:
+            selected = select_shard(args.shard, sizes, load_report(args.baseline or args.report))
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 2
+    report = BuildReport('pdf')
+
     print("\n=== Securaa PDF Generator ===\n")
 
-    # Ensure PDF directory exists
+    # Ensure PDF directory exists, without the partial files of a killed run
     PDF_DIR.mkdir(parents=True, exist_ok=True)
+    for tmp_path in PDF_DIR.glob('*.tmp'):
+        tmp_path.unlink()
+    checkpoint = load_checkpoint(CHECKPOINT_PATH, checkpoint_fingerprint(args), args.resume)
+
+    # Size concurrency from the CPU and memory this run may use
+    memory_limit = detect_memory_limit()
+    cpu_limit = detect_cpu_limit()
+    if args.memory_budget:
+        memory_budget = args.memory_budget * 1024 * 1024
+    else:
+        memory_budget = int(memory_limit * MEMORY_BUDGET_FRACTION)
+    max_pages = args.max_pages or max(1, min(cpu_limit, memory_budget // PAGE_MEMORY_ESTIMATE))
+    if args.trace_dir:
+        # Chromium records one trace at a time
+        max_pages = 1
+    print(f"  Concurrency: up to {max_pages} pages, memory budget {memory_budget // 2 ** 20} MB "
+          f"(limit {memory_limit // 2 ** 20} MB, {cpu_limit} CPUs)\n")
+
+    limiter = AdaptiveLimiter(max_pages, memory_budget)
+    pool = RenderPool(limiter, docs_per_context=args.docs_per_context, use_daemon=not args.no_daemon,
+                      smart_pagination=not args.no_smart_pagination, trace_metrics=args.trace_metrics,
+                      trace_dir=args.trace_dir, diagram_budget=args.diagram_budget, stream_pdf=args.stream_pdf)
+    monitor = asyncio.create_task(limiter.monitor())
+    backends = pdf_backends(pool, args.backend)
 
     success_count = 0
     error_count = 0
+    used_chunks = set()
+    rendered = []
 
+    jobs = []
     for html_file in HTML_FILES:
         html_path = DOCS_DIR / html_file
         pdf_file = html_file.replace('.html', '.pdf')
         pdf_path = PDF_DIR / pdf_file
+        if selected is not None and pdf_file not in selected:
+            continue
 
         if not html_path.exists():
             print(f"  Skipped: {html_file} (not found)")
             error_count += 1
             continue
 
-        try:
-            await generate_pdf(html_path, pdf_path)
+        # Prefer the print variant when it was built from the same markdown as the screen page.
+        # A split screen page holds only the first section, so it is never rendered
+        source, part = page_source(html_path)
+        print_path = PRINT_DIR / html_file
+        if (not args.no_print_variant and print_path.exists()
+                and page_source(print_path)[0] == source):
+            html_path = print_path
+        elif part != '1/1':
+            reason = ('--no-print-variant' if args.no_print_variant
+                      else 'its print variant is missing or from another build')
+            print(f"  Error: {html_file} is split into {part.split('/')[1]} pages and {reason}; "
+                  "rebuild the print variants with generate_documentation.py")
+            error_count += 1
+            continue
+
+        digest = input_digest(html_path)
+        record = finished_document(checkpoint, pdf_file, digest, pdf_path) if args.resume else None
+        if record is not None:
+            report.documents[pdf_file] = record['entry']
+            used_chunks.update(record['chunks'])
+            rendered.append(pdf_file)
             success_count += 1
-        except Exception as e:
-            print(f"  Failed: {html_file} - {e}")
+            print(f"  Resumed: {pdf_file} (finished earlier)")
+            continue
+
+        entry = report.document(pdf_file)
+        jobs.append((html_file, checkpointed_render(backends, html_path, pdf_path, args.chunked, entry,
+                                                    checkpoint, digest)))
+
+    try:
+        results = await asyncio.gather(*(job for _, job in jobs), return_exceptions=True)
+    finally:
+        monitor.cancel()
+        await pool.close()
+
+    for (html_file, _), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            print(f"  Failed: {html_file} - {result}")
             error_count += 1
+        else:
+            used_chunks |= result
+            rendered.append(html_file.replace('.html', '.pdf'))
+            success_count += 1
 
     print(f"\n=== PDF Generation Complete ===")
     print(f"  Successful: {success_count}")
     print(f"  Errors: {error_count}")
+    print(f"  Peak browser memory: {limiter.peak_rss // 2 ** 20} MB, "
+          f"contexts recycled: {pool.recycled}"
+          f"{', render daemon' if pool.daemon else ''}")
+    backend_counts = {}
+    for doc in report.documents.values():
+        if 'backend' in doc:
+            backend_counts[doc['backend']] = backend_counts.get(doc['backend'], 0) + 1
+    if backend_counts:
+        print(f"  Backends: {', '.join(f'{name} {count}' for name, count in sorted(backend_counts.items()))}")
+    print_page_counts(report, load_report(args.baseline or args.report))
+    print_metrics_summary(report)
+    print_diagram_fallbacks(report)
     print(f"  Output directory: {PDF_DIR.absolute()}")
 
+    # Only prune after a clean, complete run, so a failed or unselected document keeps its chunks
+    if args.chunked and error_count == 0 and not args.shard:
+        prune_chunk_cache(used_chunks)
+
+    # Shards leave the report to the merge step in generate_documentation.py
+    if args.shard:
+        report.finish()
+        documents = {
+            pdf_file: {'files': [(PDF_DIR / pdf_file).relative_to(DOCS_DIR).as_posix()]}
+            for pdf_file in rendered
+        }
+        path = manifest_path(DOCS_DIR, 'pdf', args.shard)
+        write_manifest(path, 'pdf', args.shard, documents, report.to_dict())
+        print(f"  Shard manifest: {path}")
+        return 1 if error_count else 0
+
+    return finish_report(report, args)
+
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    sys.exit(asyncio.run(main()))
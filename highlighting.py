@@ -0,0 +1,39 @@
+"""
+Securaa Code Highlighting
+Pygments formatter for the compact highlighting mode of the HTML generator:
+adjacent tokens of one class share a span and whitespace is left unwrapped,
+so code-heavy pages carry far fewer elements for the same colouring.
+"""
+
+from pygments.formatters import HtmlFormatter
+from pygments.token import Text, Whitespace
+
+
+def merge_tokens(tokens):
+    """
+    Merge runs of tokens that would get the same CSS class.
+
+    Whitespace tokens become plain text, which HtmlFormatter writes without a
+    span, so they merge into the surrounding text as well.
+    """
+    run_type = None
+    run = []
+    for token_type, value in tokens:
+        if token_type in Whitespace:
+            token_type = Text
+        if token_type is run_type:
+            run.append(value)
+            continue
+        if run:
+            yield run_type, ''.join(run)
+        run_type = token_type
+        run = [value]
+    if run:
+        yield run_type, ''.join(run)
+
+
+class CompactHtmlFormatter(HtmlFormatter):
+    """HtmlFormatter over merged tokens, for codehilite's pygments_formatter option."""
+
+    def format_unencoded(self, tokensource, outfile):
+        super().format_unencoded(merge_tokens(tokensource), outfile)
@@ -0,0 +1,163 @@
+"""
+Securaa Mermaid Markdown Extension
+Python-Markdown preprocessor that turns ```mermaid fences into diagram divs in
+one linear pass over the lines, skipping fences nested in other code examples
+and collecting per-diagram metadata as it goes.
+"""
+
+import html
+import re
+
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+
+# Same fence rules as fenced_code: an opener starts in column 0, and the block
+# ends at the first later line holding exactly the same fence
+FENCE_PATTERN = re.compile(r'^(~{3,}|`{3,})[ ]*(\{[^\n]*\}|\.?[\w#.+-]*)')
+
+# Runs after normalize_whitespace (30) and before fenced_code_block (25)
+PREPROCESSOR_PRIORITY = 27
+
+
+def closing_fences(lines: list) -> dict:
+    """Map every bare fence (e.g. ``` or ~~~~) to the index of the last line holding only it."""
+    last = {}
+    for index, line in enumerate(lines):
+        if line.startswith(('`', '~')):
+            fence = line.rstrip(' ')
+            if FENCE_PATTERN.match(fence) and fence.strip(fence[0]) == '':
+                last[fence] = index
+    return last
+
+
+def scan_fences(lines: list):
+    """
+    Yield (opening index, closing index, opener match) for each top-level
+    fence opener, with a closing index of None for openers without a closer.
+
+    Fences inside other fenced blocks are part of those blocks. Every line
+    is visited once: closers are looked up in closing_fences() instead of
+    scanned for.
+    """
+    last = closing_fences(lines)
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        match = FENCE_PATTERN.match(line) if line.startswith(('`', '~')) else None
+        if match is None:
+            index += 1
+            continue
+        if last.get(match.group(1), -1) <= index:
+            yield index, None, match
+            index += 1
+            continue
+
+        fence = match.group(1)
+        end = index + 1
+        while lines[end].rstrip(' ') != fence:
+            end += 1
+        yield index, end, match
+        index = end + 1
+
+
+def fenced_blocks(lines: list):
+    """
+    Yield (opening index, closing index, opener match) for each top-level fenced block.
+
+    An opener without a matching closer is not a fence (as in fenced_code).
+    """
+    for start, end, match in scan_fences(lines):
+        if end is not None:
+            yield start, end, match
+
+
+def mermaid_source(lines: list, start: int, end: int) -> tuple:
+    """Return (source, line number of its first line) of the mermaid fence between start and end."""
+    body = lines[start + 1:end]
+    leading = 0
+    while leading < len(body) and not body[leading].strip():
+        leading += 1
+    return '\n'.join(body).strip(), start + 2 + leading
+
+
+def is_mermaid_fence(line: str, match) -> bool:
+    """Whether a fence opener found by fenced_blocks() starts a mermaid diagram."""
+    return match.group(2).lstrip('.') == 'mermaid' and line[match.end():].strip() == ''
+
+
+def convert_mermaid_fences(lines: list, render) -> list:
+    """
+    Replace each top-level mermaid fence with the line render(source, first line).
+
+    Other fenced blocks are copied through untouched, including any mermaid
+    fences inside them. Openers without a closer are indented by one space:
+    fenced_code would otherwise search the rest of the document for a closer
+    from each of them, which is quadratic when there are many, while Markdown
+    renders the indented line as the same paragraph text. A bare fence (the
+    last of its kind) is left alone, as there is at most one per fence.
+    """
+    output = []
+    copied = 0
+    for start, end, match in scan_fences(lines):
+        if end is None:
+            if lines[start].rstrip(' ') != match.group(1):
+                output.extend(lines[copied:start])
+                output.append(' ' + lines[start])
+                copied = start + 1
+        elif is_mermaid_fence(lines[start], match):
+            output.extend(lines[copied:start])
+            output.extend(['', render(*mermaid_source(lines, start, end)), ''])
+            copied = end + 1
+    output.extend(lines[copied:])
+    return output
+
+
+class MermaidPreprocessor(Preprocessor):
+    """Stash each mermaid fence as a <div class="mermaid"> before fenced_code sees it."""
+
+    def __init__(self, md, validate=None):
+        super().__init__(md)
+        self.validate = validate
+
+    def render(self, source: str, first_line: int) -> str:
+        if self.validate is not None:
+            diagram = self.validate(source, first_line)
+        else:
+            diagram = {'line': first_line, 'errors': []}
+        self.md.mermaid_diagrams.append(diagram)
+        if diagram['errors']:
+            block = f'<pre class="mermaid-invalid">{html.escape(source)}</pre>'
+        else:
+            # data-line lets the page report the source line of a failed render
+            block = f'<div class="mermaid" data-line="{first_line}">\n{source}\n</div>'
+        return self.md.htmlStash.store(block)
+
+    def run(self, lines: list) -> list:
+        return convert_mermaid_fences(lines, self.render)
+
+
+class MermaidExtension(Extension):
+    """
+    Render ```mermaid fences as diagram divs.
+
+    After each convert(), md.mermaid_diagrams lists one entry per diagram:
+    the result of validate (a callable taking the source and its first line
+    number, returning a dict with 'line' and 'errors'), or just the line when
+    no validator is given. Diagrams with errors are
+    emitted as escaped source in a <pre class="mermaid-invalid"> instead.
+    """
+
+    def __init__(self, validate=None, **kwargs):
+        # Kept off self.config, which would coerce a callable to a bool
+        self.validate = validate
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md):
+        md.registerExtension(self)
+        self.md = md
+        self.reset()
+        md.preprocessors.register(MermaidPreprocessor(md, self.validate), 'mermaid',
+                                  PREPROCESSOR_PRIORITY)
+
+    def reset(self):
+        self.md.mermaid_diagrams = []
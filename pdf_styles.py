@@ -0,0 +1,320 @@
+"""
+Securaa PDF Styles
+Print stylesheet shared by the HTML generator, which bakes it into print
+variants, and the PDF generator, kept apart so HTML builds import neither
+Playwright, pypdf nor asyncio.
+"""
+
+# Enhanced CSS for PDF rendering - with LARGER diagrams
+PDF_CSS = """
+/* PDF-specific styles for better diagram rendering */
+@page {
+    size: A4;
+    margin: 12mm 10mm 15mm 10mm;
+}
+
+/* General text styling for better PDF readability */
+body {
+    font-family: 'Helvetica Neue', Arial, sans-serif !important;
+    font-size: 10pt !important;
+    line-height: 1.5 !important;
+    color: #1a1a1a !important;
+    background: white !important;
+}
+
+/* Hide navigation and footer for PDF */
+.main-header,
+.documentation-nav,
+.footer {
+    display: none !important;
+}
+
+/* Main content area - use full width */
+.main-content {
+    max-width: 100% !important;
+    margin: 0 !important;
+    padding: 0 !important;
+    box-shadow: none !important;
+    border-radius: 0 !important;
+}
+
+/* Typography for PDF */
+h1 {
+    font-size: 20pt !important;
+    color: #1a365d !important;
+    -webkit-text-fill-color: #1a365d !important;
+    background: none !important;
+    border-bottom: 2px solid #3182ce !important;
+    padding-bottom: 6pt !important;
+    margin-top: 0 !important;
+    margin-bottom: 12pt !important;
+    page-break-after: avoid !important;
+}
+
+h2 {
+    font-size: 14pt !important;
+    color: #2c5282 !important;
+    border-bottom: 1px solid #cbd5e0 !important;
+    padding-bottom: 4pt !important;
+    margin-top: 16pt !important;
+    margin-bottom: 8pt !important;
+    page-break-after: avoid !important;
+}
+
+h3 {
+    font-size: 12pt !important;
+    color: #2d3748 !important;
+    margin-top: 12pt !important;
+    margin-bottom: 6pt !important;
+    page-break-after: avoid !important;
+}
+
+h4 {
+    font-size: 11pt !important;
+    color: #4a5568 !important;
+    margin-top: 10pt !important;
+    margin-bottom: 4pt !important;
+    page-break-after: avoid !important;
+}
+
+h5, h6 {
+    font-size: 10pt !important;
+    color: #4a5568 !important;
+    page-break-after: avoid !important;
+}
+
+p {
+    margin-bottom: 6pt !important;
+    text-align: justify !important;
+    orphans: 3 !important;
+    widows: 3 !important;
+}
+
+/* Lists */
+ul, ol {
+    margin-bottom: 6pt !important;
+    padding-left: 18pt !important;
+}
+
+li {
+    margin-bottom: 3pt !important;
+}
+
+/* Code blocks */
+pre {
+    background: #f7fafc !important;
+    color: #2d3748 !important;
+    border: 1px solid #e2e8f0 !important;
+    border-radius: 4pt !important;
+    padding: 8pt !important;
+    font-size: 7pt !important;
+    line-height: 1.3 !important;
+    overflow-x: visible !important;
+    white-space: pre-wrap !important;
+    word-wrap: break-word !important;
+    margin: 8pt 0 !important;
+}
+
+code {
+    font-family: 'Consolas', 'Monaco', monospace !important;
+    font-size: 7pt !important;
+}
+
+:not(pre) > code {
+    background: #edf2f7 !important;
+    color: #2d3748 !important;
+    padding: 1pt 3pt !important;
+    border-radius: 2pt !important;
+}
+
+/* Tables */
+table {
+    width: 100% !important;
+    border-collapse: collapse !important;
+    margin: 8pt 0 !important;
+    font-size: 8pt !important;
+}
+
+thead {
+    background: #2c5282 !important;
+    display: table-header-group !important;
+}
+
+tr {
+    page-break-inside: avoid !important;
+}
+
+th {
+    color: white !important;
+    padding: 6pt !important;
+    text-align: left !important;
+    font-weight: 600 !important;
+    font-size: 7pt !important;
+}
+
+td {
+    padding: 5pt 6pt !important;
+    border: 1px solid #e2e8f0 !important;
+}
+
+tr:nth-child(even) {
+    background: #f7fafc !important;
+}
+
+/* Blockquotes */
+blockquote {
+    border-left: 3pt solid #3182ce !important;
+    padding-left: 10pt !important;
+    margin: 8pt 0 !important;
+    background: #ebf8ff !important;
+    padding: 8pt !important;
+    border-radius: 0 4pt 4pt 0 !important;
+    page-break-inside: avoid !important;
+}
+
+/* Code blocks and tables: the pagination stage keeps short ones whole and
+   splits long ones into pieces that continue one another */
+.keep-together {
+    page-break-inside: avoid !important;
+}
+
+pre.continues,
+table.continues {
+    margin-bottom: 0 !important;
+}
+
+pre.continued {
+    margin-top: 0 !important;
+    border-top-style: dashed !important;
+}
+
+table.continued {
+    margin-top: 0 !important;
+}
+
+/* Links */
+a {
+    color: #2b6cb0 !important;
+    text-decoration: none !important;
+}
+
+/* Horizontal rules */
+hr {
+    border: none !important;
+    border-top: 1px solid #e2e8f0 !important;
+    margin: 12pt 0 !important;
+}
+
+/* MERMAID DIAGRAMS - LARGE and readable */
+.mermaid {
+    display: block !important;
+    width: 100% !important;
+    margin: 12pt 0 !important;
+    padding: 8pt !important;
+    background: #ffffff !important;
+    border: 1px solid #e2e8f0 !important;
+    border-radius: 4pt !important;
+    page-break-inside: avoid !important;
+    overflow: visible !important;
+    text-align: center !important;
+}
+
+/* SVG should take full width */
+.mermaid svg {
+    display: block !important;
+    margin: 0 auto !important;
+    width: 100% !important;
+    max-width: none !important;
+    height: auto !important;
+    min-height: 100px !important;
+}
+
+/* Ensure diagram labels are readable - LARGER font */
+.mermaid text,
+.mermaid .nodeLabel,
+.mermaid .label,
+.mermaid .edgeLabel,
+.mermaid .cluster-label,
+.mermaid tspan {
+    font-family: 'Helvetica Neue', Arial, sans-serif !important;
+    font-size: 10pt !important;
+    fill: #1a202c !important;
+}
+
+/* Node styling for better visibility */
+.mermaid .node rect,
+.mermaid .node circle,
+.mermaid .node polygon,
+.mermaid .node ellipse {
+    stroke: #2d3748 !important;
+    stroke-width: 1.5px !important;
+}
+
+/* Edge/line styling - thicker lines */
+.mermaid .edgePath path,
+.mermaid .flowchart-link {
+    stroke: #2d3748 !important;
+    stroke-width: 2px !important;
+}
+
+/* Arrow styling */
+.mermaid marker path {
+    fill: #2d3748 !important;
+}
+
+/* Cluster/subgraph styling */
+.mermaid .cluster rect {
+    fill: #f0f4f8 !important;
+    stroke: #718096 !important;
+    stroke-width: 1.5px !important;
+}
+
+/* Sequence diagram specific */
+.mermaid .actor {
+    stroke: #2d3748 !important;
+    fill: #e2e8f0 !important;
+}
+
+.mermaid .actor-line {
+    stroke: #718096 !important;
+    stroke-width: 1px !important;
+}
+
+.mermaid .messageLine0,
+.mermaid .messageLine1 {
+    stroke: #2d3748 !important;
+    stroke-width: 1.5px !important;
+}
+
+/* ER diagram specific */
+.mermaid .er.entityBox {
+    fill: #e2e8f0 !important;
+    stroke: #2d3748 !important;
+}
+
+/* Class diagram specific */
+.mermaid .classGroup rect {
+    fill: #e2e8f0 !important;
+    stroke: #2d3748 !important;
+}
+
+/* Flowchart specific - node colors */
+.mermaid .node.default > rect,
+.mermaid .node.default > polygon {
+    fill: #e2e8f0 !important;
+}
+
+/* Page break handling */
+h2 {
+    page-break-before: auto !important;
+}
+
+h1, h2, h3, h4, h5, h6 {
+    page-break-after: avoid !important;
+}
+
+/* Large diagrams get their own page */
+.mermaid.large-diagram {
+    page-break-before: always !important;
+}
+"""
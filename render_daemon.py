@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Securaa Render Daemon
+Keeps a warm headless Chromium with a persistent profile that the PDF generators
+connect to over CDP instead of launching their own browser.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+from playwright.async_api import async_playwright
+
+
+# Configuration
+DOCS_DIR = Path('docs')
+CACHE_DIR = Path('.doc-cache')
+PROFILE_DIR = CACHE_DIR / 'chromium-profile'
+STATE_FILE = CACHE_DIR / 'render-daemon.json'
+DEFAULT_PORT = 9333
+
+# Pages loaded at startup so the HTTP cache and V8 code cache hold the
+# documentation template's scripts (mermaid.min.js) and fonts
+WARM_PAGES = [
+    'securaa-platform-high-level-design.html',
+    'index.html',
+]
+
+
+def read_state():
+    """Return the running daemon's state ({'endpoint', 'pid'}) or None."""
+    try:
+        state = json.loads(STATE_FILE.read_text(encoding='utf-8'))
+        os.kill(state['pid'], 0)
+    except (OSError, ValueError, KeyError):
+        return None
+    return state
+
+
+async def warm_up(context):
+    """Load the template pages once and keep the last one open."""
+    page = await context.new_page()
+    for html_file in WARM_PAGES:
+        html_path = DOCS_DIR / html_file
+        if not html_path.exists():
+            continue
+        start = time.perf_counter()
+        await page.goto(f'file://{html_path.absolute()}', wait_until='load')
+        await page.evaluate("() => document.fonts.ready.then(() => true)")
+        print(f"  Warmed: {html_file} ({time.perf_counter() - start:.2f}s)")
+    return page
+
+
+async def serve(port: int):
+    """Run the browser until SIGINT or SIGTERM."""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    async with async_playwright() as p:
+        # The persistent profile keeps the compiled script cache across daemon restarts
+        context = await p.chromium.launch_persistent_context(
+            str(PROFILE_DIR),
+            headless=True,
+            args=[f'--remote-debugging-port={port}', '--remote-debugging-address=127.0.0.1'],
+        )
+        try:
+            await warm_up(context)
+            STATE_FILE.write_text(json.dumps({
+                'endpoint': f'http://127.0.0.1:{port}',
+                'pid': os.getpid(),
+            }), encoding='utf-8')
+            print(f"  Listening: http://127.0.0.1:{port} (profile {PROFILE_DIR})")
+            await stop.wait()
+        finally:
+            STATE_FILE.unlink(missing_ok=True)
+            await context.close()
+
+
+def stop_daemon() -> int:
+    """Signal a running daemon to shut down."""
+    state = read_state()
+    if state is None:
+        print("  Render daemon is not running")
+        return 1
+    os.kill(state['pid'], signal.SIGTERM)
+    print(f"  Stopped render daemon (pid {state['pid']})")
+    return 0
+
+
+def main(argv=None) -> int:
+    """Main function to start, stop or query the render daemon."""
+    parser = argparse.ArgumentParser(description='Warm headless Chromium for the Securaa PDF generators.')
+    parser.add_argument('command', choices=['start', 'stop', 'status'], nargs='?', default='start')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='CDP port to listen on')
+    args = parser.parse_args(argv)
+
+    if args.command == 'stop':
+        return stop_daemon()
+    if args.command == 'status':
+        state = read_state()
+        print(f"  Render daemon: {state['endpoint']} (pid {state['pid']})" if state else
+              "  Render daemon is not running")
+        return 0 if state else 1
+
+    if read_state() is not None:
+        print("  Render daemon is already running")
+        return 1
+    print("\n=== Securaa Render Daemon ===\n")
+    asyncio.run(serve(args.port))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Securaa Documentation Service Worker
+Precache manifest and service worker for the generated site, so pages open
+instantly from cache and keep working offline. The manifest lists the core
+pages with a hash of their contents, and its version (a hash of the entries
+and the worker) names the caches of each build.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from string import Template
+
+# Configuration
+SERVICE_WORKER_NAME = 'sw.js'
+MANIFEST_NAME = 'precache-manifest.json'
+CORE_PAGES = ('index.html', '*-high-level-design.html')   # glob patterns, relative to the docs directory
+CDN_HOSTS = ('cdn.jsdelivr.net', 'fonts.googleapis.com', 'fonts.gstatic.com')
+
+SERVICE_WORKER_TEMPLATE = Template("""// Securaa Documentation service worker, written by generate_documentation.py.
+// The core pages in precache-manifest.json are cached on install. Every page is served from
+// cache and refreshed in the background (stale-while-revalidate), and so are the scripts and
+// fonts the pages load from CDN_HOSTS. PDFs are cached the first time they are opened and
+// refreshed the same way, since the PDF generator rewrites them without a new manifest version.
+// Each build has its own caches, and activating a new build's worker deletes the old ones.
+var VERSION = '$version';
+var PREFIX = 'securaa-docs-';
+var PAGES = PREFIX + 'pages-' + VERSION;
+var PDFS = PREFIX + 'pdfs-' + VERSION;
+var ASSETS = PREFIX + 'assets-' + VERSION;
+var CDN_HOSTS = $cdn_hosts;
+
+self.addEventListener('install', function(event) {
+    event.waitUntil(fetch('$manifest', { cache: 'no-store' }).then(function(response) {
+        return response.json();
+    }).then(function(manifest) {
+        // A manifest from a half-deployed build fails the install, which is retried later
+        if (manifest.version !== VERSION) {
+            throw new Error('precache manifest is from another build');
+        }
+        return caches.open(PAGES).then(function(cache) {
+            return cache.addAll(manifest.entries.map(function(entry) {
+                return new Request(entry.url, { cache: 'no-cache' });
+            }));
+        });
+    }).then(function() {
+        return self.skipWaiting();
+    }));
+});
+
+self.addEventListener('activate', function(event) {
+    event.waitUntil(caches.keys().then(function(names) {
+        return Promise.all(names.filter(function(name) {
+            return name.indexOf(PREFIX) === 0 && [PAGES, PDFS, ASSETS].indexOf(name) < 0;
+        }).map(function(name) {
+            return caches.delete(name);
+        }));
+    }).then(function() {
+        return self.clients.claim();
+    }));
+});
+
+function staleWhileRevalidate(event, cacheName, request, key) {
+    return caches.open(cacheName).then(function(cache) {
+        return cache.match(key, { ignoreSearch: true }).then(function(cached) {
+            var network = fetch(request).then(function(response) {
+                if (response.ok || response.type === 'opaque') {
+                    event.waitUntil(cache.put(key, response.clone()));
+                }
+                return response;
+            });
+            if (cached) {
+                event.waitUntil(network.catch(function() {}));
+                return cached;
+            }
+            // Offline on a page that was never opened: show the home page instead
+            return request.mode !== 'navigate' ? network : network.catch(function() {
+                return cache.match('index.html').then(function(index) {
+                    return index || Promise.reject(new Error('offline'));
+                });
+            });
+        });
+    });
+}
+
+self.addEventListener('fetch', function(event) {
+    var request = event.request;
+    if (request.method !== 'GET' || request.headers.has('range')) {
+        return;
+    }
+    var url = new URL(request.url);
+    if (url.href.indexOf(self.registration.scope) === 0) {
+        if (/\\.pdf$$/.test(url.pathname)) {
+            event.respondWith(staleWhileRevalidate(event, PDFS, request, request));
+        } else {
+            var key = /\\/$$/.test(url.pathname) ? new URL('index.html', url).href : request;
+            event.respondWith(staleWhileRevalidate(event, PAGES, request, key));
+        }
+    } else if (CDN_HOSTS.indexOf(url.hostname) >= 0) {
+        event.respondWith(staleWhileRevalidate(event, ASSETS, request, request));
+    }
+});
+""")
+
+
+def precache_manifest(docs_dir: Path, patterns: tuple = CORE_PAGES) -> dict:
+    """
+    List the core pages in docs_dir with a hash of each one's contents.
+    Returns {'version', 'entries': [{'url', 'revision'}]}; the version changes
+    whenever a page or the service worker does.
+    """
+    entries = []
+    for pattern in patterns:
+        for path in sorted(Path(docs_dir).glob(pattern)):
+            entries.append({
+                'url': path.relative_to(docs_dir).as_posix(),
+                'revision': hashlib.sha256(path.read_bytes()).hexdigest()[:16],
+            })
+    digest = hashlib.sha256(SERVICE_WORKER_TEMPLATE.template.encode('utf-8'))
+    digest.update(json.dumps(entries, sort_keys=True).encode('utf-8'))
+    return {'version': digest.hexdigest()[:16], 'entries': entries}
+
+
+def render_service_worker(manifest: dict) -> str:
+    """The service worker for a build with this precache manifest."""
+    return SERVICE_WORKER_TEMPLATE.substitute(version=manifest['version'], manifest=MANIFEST_NAME,
+                                              cdn_hosts=json.dumps(list(CDN_HOSTS)))
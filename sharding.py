@@ -0,0 +1,144 @@
+"""
+Securaa Documentation Sharding
+Deterministic partitioning of documents across CI machines, balanced by the
+per-document cost recorded in previous build reports, and the shard manifests
+the merge step reads back.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+SHARD_PATTERN = re.compile(r'^(\d+)/(\d+)$')
+SHARD_MANIFEST_GLOB = '.shard-*.json'
+
+
+def parse_shard(spec: str) -> tuple:
+    """Parse an 'i/N' shard spec (1-based) into (i, N)."""
+    match = SHARD_PATTERN.match(spec or '')
+    if not match:
+        raise ValueError(f"invalid shard '{spec}', expected i/N")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise ValueError(f"invalid shard '{spec}', i must be between 1 and N")
+    return index, count
+
+
+def document_costs(sizes: dict, previous_report: dict = None) -> dict:
+    """
+    Estimate the build cost of each document in seconds.
+
+    Documents with history use the sum of their stage timings from the
+    previous report. The rest are estimated from their input size using the
+    average seconds per byte of the documents that have history, or just
+    their size when there is no history at all.
+    """
+    history = (previous_report or {}).get('documents', {})
+    costs = {}
+    timed_bytes = 0
+    timed_seconds = 0.0
+    for name, size in sizes.items():
+        stages = history.get(name, {}).get('stages')
+        if stages:
+            costs[name] = sum(stages.values())
+            timed_bytes += size
+            timed_seconds += costs[name]
+
+    seconds_per_byte = timed_seconds / timed_bytes if timed_bytes else 1.0
+    for name, size in sizes.items():
+        if name not in costs:
+            costs[name] = size * seconds_per_byte
+    return costs
+
+
+def assign_shards(costs: dict, count: int) -> list:
+    """
+    Partition documents into count shards of near-equal total cost.
+
+    Longest-processing-time-first: documents are taken by descending cost
+    (ties by name) and each goes to the least loaded shard (ties by shard
+    number), so every machine computes the same partition from the same
+    costs. Returns a list of sets of document names.
+    """
+    shards = [set() for _ in range(count)]
+    loads = [0.0] * count
+    for name in sorted(costs, key=lambda n: (-costs[n], n)):
+        target = min(range(count), key=lambda i: (loads[i], i))
+        shards[target].add(name)
+        loads[target] += costs[name]
+    return shards
+
+
+def select_shard(spec: str, sizes: dict, previous_report: dict = None) -> set:
+    """Return the documents that belong to shard spec ('i/N')."""
+    index, count = parse_shard(spec)
+    return assign_shards(document_costs(sizes, previous_report), count)[index - 1]
+
+
+def manifest_path(output_dir: Path, generator: str, spec: str) -> Path:
+    index, count = parse_shard(spec)
+    return output_dir / f'.shard-{generator}-{index}-of-{count}.json'
+
+
+def write_manifest(path: Path, generator: str, spec: str, documents: dict, report: dict):
+    """
+    Record what a shard built: per document the files it wrote (relative to
+    the output directory) plus generator-specific data such as anchors.
+    """
+    index, count = parse_shard(spec)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'generator': generator,
+            'shard': index,
+            'shards': count,
+            'documents': {name: documents[name] for name in sorted(documents)},
+            'report': report,
+        }, f, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def load_manifests(shard_dirs: list) -> list:
+    """Load every shard manifest from the given directories as (directory, manifest)."""
+    manifests = []
+    for shard_dir in shard_dirs:
+        for path in sorted(Path(shard_dir).glob(SHARD_MANIFEST_GLOB)):
+            with open(path, 'r', encoding='utf-8') as f:
+                manifests.append((Path(shard_dir), json.load(f)))
+    return manifests
+
+
+def verify_manifests(manifests: list, generator: str, expected: list) -> list:
+    """
+    Check that the shards of one generator cover every expected document exactly once.
+
+    Returns a list of human-readable problems.
+    """
+    problems = []
+    owners = {}
+    seen_shards = set()
+    shard_counts = set()
+    for shard_dir, manifest in manifests:
+        if manifest['generator'] != generator:
+            continue
+        seen_shards.add(manifest['shard'])
+        shard_counts.add(manifest['shards'])
+        for name in manifest['documents']:
+            owners.setdefault(name, []).append(f"{shard_dir} (shard {manifest['shard']})")
+
+    if not shard_counts:
+        return [f"no {generator} shard manifests found"]
+    if len(shard_counts) > 1:
+        problems.append(f"{generator} shards disagree on the shard count: {sorted(shard_counts)}")
+    for index in range(1, max(shard_counts) + 1):
+        if index not in seen_shards:
+            problems.append(f"{generator} shard {index}/{max(shard_counts)} is missing")
+    for name in expected:
+        if name not in owners:
+            problems.append(f"{name}: not built by any {generator} shard")
+    for name, shard_names in sorted(owners.items()):
+        if len(shard_names) > 1:
+            problems.append(f"{name}: built by several shards: {', '.join(shard_names)}")
+    return problems
@@ -0,0 +1,111 @@
+"""
+Checks for the browser-free (WeasyPrint) PDF backend, which is opt-in
+(--backend weasyprint) until its output is known to match Chromium's.
+Skipped when WeasyPrint or pypdf is not installed.
+"""
+
+import importlib.util
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+MM = 72 / 25.4   # PDF points per millimetre
+A4 = (210 * MM, 297 * MM)
+MARGINS = {'top': 12 * MM, 'right': 10 * MM, 'bottom': 15 * MM, 'left': 10 * MM}   # PDF_MARGIN, PDF_CSS
+
+SAMPLE_MARKDOWN = '''# Sample Document
+
+## Overview
+
+''' + '\n\n'.join(f'Paragraph {number} of the sample document, long enough to wrap across the full '
+                  f'width of the printed page and show where the body text starts and ends.'
+                  for number in range(1, 60)) + '''
+
+```python
+print("no diagrams here")
+```
+'''
+
+
+def renderer_available() -> bool:
+    """Whether WeasyPrint imports (it also needs the system Pango libraries) and pypdf is installed."""
+    if importlib.util.find_spec('pypdf') is None:
+        return False
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+@unittest.skipUnless(renderer_available(), 'needs WeasyPrint (with its Pango libraries) and pypdf')
+class WeasyPrintBackendTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from pypdf import PdfReader
+
+        import generate_documentation as docs
+        import generate_pdfs_enhanced as pdf
+
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        print_dir = Path(cls.tmp_dir.name) / 'print'
+        print_dir.mkdir()
+        html_path = print_dir / 'sample.html'
+        parsed = docs.parse_markdown(SAMPLE_MARKDOWN)
+        html_path.write_text(docs.OUTPUT_VARIANTS['print'].render('Sample Document', parsed), encoding='utf-8')
+
+        backend = pdf.WeasyPrintBackend(print_dir)
+        assert backend.accepts(html_path.read_text(encoding='utf-8'))
+        pdf_path = Path(cls.tmp_dir.name) / 'sample.pdf'
+        backend.write_pdf(html_path, pdf_path)
+        cls.reader = PdfReader(pdf_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def text_positions(self, page) -> list:
+        """(text, x, y) of every text run on a page, in PDF points from the bottom left."""
+        runs = []
+
+        def visit(text, cm, tm, font_dict, font_size):
+            if text.strip():
+                runs.append((text.strip(), cm[4] + tm[4] * cm[0], cm[5] + tm[5] * cm[3]))
+
+        page.extract_text(visitor_text=visit)
+        return runs
+
+    def test_pages_are_a4(self):
+        self.assertGreater(len(self.reader.pages), 1)
+        for page in self.reader.pages:
+            self.assertAlmostEqual(float(page.mediabox.width), A4[0], delta=1)
+            self.assertAlmostEqual(float(page.mediabox.height), A4[1], delta=1)
+
+    def test_body_stays_inside_the_margins(self):
+        width, height = A4
+        for page in self.reader.pages:
+            body = [(text, x, y) for text, x, y in self.text_positions(page)
+                    if MARGINS['bottom'] < y < height - MARGINS['top']]
+            self.assertTrue(body)
+            for text, x, _ in body:
+                self.assertGreaterEqual(x, MARGINS['left'] - 1, text)
+                self.assertLess(x, width - MARGINS['right'], text)
+
+    def test_header_and_footer_on_every_page(self):
+        total = len(self.reader.pages)
+        height = A4[1]
+        for number, page in enumerate(self.reader.pages, 1):
+            runs = self.text_positions(page)
+            header = ' '.join(text for text, _, y in runs if y >= height - MARGINS['top'])
+            footer = ' '.join(text for text, _, y in runs if y <= MARGINS['bottom'])
+            self.assertIn('Securaa Platform Documentation', header)
+            self.assertIn('Confidential', footer)
+            self.assertIn(f'Page {number} of {total}', footer)
+
+
+if __name__ == '__main__':
+    unittest.main()